@@ -1,6 +1,6 @@
 {
     "name": "Property Tenant Portal",
-    "version": "18.0.1.0.0",
+    "version": "18.0.1.1.0",
     "category": "Property",
     "author": "Sachini Peiris",
     "summary": "Tenant portal for rent, leases, and maintenance",
@@ -14,6 +14,7 @@
         "mail",
         "sms",
         "payment",
+        "account_payment",
         "payment_stripe",
     ],
     "data": [
@@ -22,11 +23,20 @@
         "data/sequences.xml",
         "data/cron.xml",
         "data/sms_cron.xml",
+        "data/tenant_counter_data.xml",
+        "data/perf_metrics_data.xml",
+        "data/archive_data.xml",
         "views/property_views.xml",
         "views/unit_views.xml",
         "views/lease_views.xml",
         "views/maintenance_views.xml",
         "views/report_views.xml",
+        "views/rent_sms_views.xml",
+        "views/arrears_views.xml",
+        "views/lease_lifecycle_views.xml",
+        "views/statement_export_views.xml",
+        "views/statement_export_reports.xml",
+        "views/perf_metrics_views.xml",
         "views/portal_templates.xml",
         "views/portal_maintenance_templates.xml"
     ],
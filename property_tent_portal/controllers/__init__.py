@@ -1,2 +1,4 @@
+from . import metrics
 from . import portal
 from . import payment_override
+from . import export
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+from odoo import api, fields, http
+from odoo.http import Response, content_disposition, request
+
+EXPORT_CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "pdf": "application/zip",
+}
+
+
+def _parse_ids(value):
+    try:
+        return [int(record_id) for record_id in value.split(",") if record_id]
+    except (AttributeError, ValueError):
+        return []
+
+
+class PropertyExport(http.Controller):
+    @http.route(
+        "/property_tent_portal/export/<any(statement,rent_roll):export_type>",
+        type="http",
+        auth="user",
+        methods=["GET"],
+    )
+    def export(self, export_type, fmt="csv", date_from=None, date_to=None, property_ids=None, tenant_ids=None, **kw):
+        """Stream tenant statements or the rent roll as CSV, XLSX or a zip of PDFs."""
+        if fmt not in EXPORT_CONTENT_TYPES or not request.env.user.has_group("account.group_account_invoice"):
+            return request.not_found()
+        params = {
+            "date_from": fields.Date.to_date(date_from) if date_from else None,
+            "date_to": fields.Date.to_date(date_to) if date_to else fields.Date.context_today(request.env.user),
+            "property_ids": _parse_ids(property_ids),
+            "tenant_ids": _parse_ids(tenant_ids),
+        }
+        if params["date_from"] is None:
+            params["date_from"] = params["date_to"].replace(day=1)
+        # Checked before streaming: an error raised by the body would cut
+        # the download short.
+        request.env["property.statement.export"]._check_export_access()
+        filename = request.env["property.statement.export"]._get_export_filename(export_type, fmt)
+        body = self._stream_export(
+            request.env.registry, request.env.uid, dict(request.env.context), export_type, fmt, params
+        )
+        return Response(
+            body,
+            headers=[
+                ("Content-Type", EXPORT_CONTENT_TYPES[fmt]),
+                ("Content-Disposition", content_disposition(filename)),
+                ("Cache-Control", "no-store"),
+            ],
+            direct_passthrough=True,
+        )
+
+    def _stream_export(self, registry, uid, context, export_type, fmt, params):
+        # The body is consumed once the request is over: the request and its
+        # cursor are gone, so the export reads through a cursor of its own
+        # and must not touch ``request``.
+        with registry.cursor() as cr:
+            env = api.Environment(cr, uid, context)
+            yield from env["property.statement.export"]._stream_export(export_type, fmt, params)
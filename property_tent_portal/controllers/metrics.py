@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import functools
+import time
+
+from odoo import http
+from odoo.http import Response, request
+from odoo.tools import consteq
+
+from odoo.addons.property_tent_portal.models.perf_metrics import METRICS_TOKEN_PARAM
+
+
+def track_route(name):
+    """Record the latency and query count of a route under ``name`` when metrics are enabled."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if not request.env["property.perf.run"]._metrics_enabled():
+                return func(self, *args, **kwargs)
+            cr = request.env.cr
+            queries = cr.sql_log_count
+            started = time.perf_counter()
+            try:
+                response = func(self, *args, **kwargs)
+                # Render lazy QWeb responses now so the template is measured too.
+                if isinstance(response, Response) and response.is_qweb:
+                    response.flatten()
+                return response
+            finally:
+                request.env["property.perf.route.stat"]._record(
+                    name, time.perf_counter() - started, cr.sql_log_count - queries
+                )
+
+        return wrapper
+
+    return decorator
+
+
+class PropertyMetrics(http.Controller):
+    @http.route("/property_tent_portal/metrics", type="http", auth="none", csrf=False, save_session=False)
+    def metrics(self, token=None, **kw):
+        env = request.env(su=True)
+        expected = env["ir.config_parameter"].get_param(METRICS_TOKEN_PARAM)
+        authorization = request.httprequest.headers.get("Authorization", "")
+        if authorization.startswith("Bearer "):
+            token = authorization[len("Bearer "):]
+        if not expected or not token or not consteq(token, expected) or not env["property.perf.run"]._metrics_enabled():
+            return request.not_found()
+        return request.make_response(
+            env["property.perf.run"].get_exposition(),
+            headers=[("Content-Type", "text/plain; version=0.0.4; charset=utf-8"), ("Cache-Control", "no-store")],
+        )
@@ -1,89 +1,338 @@
 # -*- coding: utf-8 -*-
-from odoo import http
-from odoo.addons.portal.controllers.portal import CustomerPortal, pager as portal_pager
-from odoo.http import request
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import timezone
+
+from werkzeug.urls import url_encode
+
+from odoo import fields, http
+from odoo.addons.portal.controllers.portal import CustomerPortal
+from odoo.exceptions import ValidationError
+from odoo.http import Response, request
+
+from odoo.addons.property_tent_portal.controllers.metrics import track_route
+
+PORTAL_PAGE_SIZE = 20
+PORTAL_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Pages also show data outside the versioned records (unit names, layout),
+# so cached renders are bounded in age as well.
+PORTAL_CACHE_TTL = 300
+
+
+def _parse_cursor(cursor):
+    try:
+        date_str, record_id = cursor.split("_")
+        return fields.Date.to_date(date_str), int(record_id)
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def _format_cursor(record, date_field):
+    return "%s_%s" % (fields.Date.to_string(record[date_field]), record.id)
+
+
+def keyset_page(model, domain, date_field, field_names, url, step=PORTAL_PAGE_SIZE, after=None, before=None):
+    """Return one page of ``model`` ordered by ``date_field`` then id, newest first.
+
+    Pages are addressed by the boundary row of the neighbouring page rather
+    than an offset, so a deep page costs the same index range scan as the
+    first one.
+    """
+    before_key = _parse_cursor(before)
+    after_key = _parse_cursor(after)
+    key = before_key or after_key
+    page_domain = []
+    if key:
+        operator = ">" if before_key else "<"
+        page_domain = [
+            "|",
+            (date_field, operator, key[0]),
+            "&",
+            (date_field, "=", key[0]),
+            ("id", operator, key[1]),
+        ]
+    direction = "asc" if before_key else "desc"
+    records = model.search_fetch(
+        domain + page_domain,
+        field_names,
+        order=f"{date_field} {direction}, id {direction}",
+        limit=step + 1,
+    )
+    has_more = len(records) > step
+    records = records[:step]
+    if before_key:
+        records = records[::-1]
+        has_previous, has_next = has_more, True
+    else:
+        has_previous, has_next = bool(after_key), has_more
+    pager = {"previous_url": False, "next_url": False}
+    if records and has_previous:
+        pager["previous_url"] = "%s?%s" % (url, url_encode({"before": _format_cursor(records[0], date_field)}))
+    if records and has_next:
+        pager["next_url"] = "%s?%s" % (url, url_encode({"after": _format_cursor(records[-1], date_field)}))
+    return records, pager
+
+
+class PortalRenderCache:
+    """Rendered pages of this process, evicted least recently used first past ``max_bytes``."""
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[1] > self.ttl:
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+            self._entries[key] = (body, time.monotonic())
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+
+    def _pop(self, key):
+        body, _stored_at = self._entries.pop(key)
+        self.size -= len(body)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+portal_render_cache = PortalRenderCache(PORTAL_CACHE_MAX_BYTES, PORTAL_CACHE_TTL)
 
 
 class TenantPortal(CustomerPortal):
+    def _get_page_version(self, model, domain):
+        """Return the last write date and the number of the records of ``domain``."""
+        [(last_write, count)] = model._read_group(domain, aggregates=["write_date:max", "__count"])
+        return last_write, count
+
+    def _render_cached(self, template, versions, prepare_values):
+        """Render ``template`` unless the client or the render cache has this version already.
+
+        ``versions`` are the (last write date, count) pairs of the records the
+        page shows. They make up the ETag with the partner, session, language
+        and URL, so a conditional GET of an unchanged page is answered with a
+        304 and ``prepare_values`` only runs on a cache miss.
+        """
+        httprequest = request.httprequest
+        etag = hashlib.sha1(
+            repr(
+                (
+                    request.env.user.partner_id.id,
+                    request.session.sid,
+                    request.env.lang,
+                    httprequest.full_path,
+                    [(str(last_write), count) for last_write, count in versions],
+                )
+            ).encode()
+        ).hexdigest()
+        last_modified = max((last_write for last_write, _count in versions if last_write), default=None)
+        if last_modified:
+            last_modified = last_modified.replace(microsecond=0, tzinfo=timezone.utc)
+        if httprequest.if_none_match:
+            not_modified = httprequest.if_none_match.contains(etag)
+        else:
+            not_modified = bool(
+                last_modified and httprequest.if_modified_since and httprequest.if_modified_since >= last_modified
+            )
+        if not_modified:
+            response = Response(status=304)
+        else:
+            body = portal_render_cache.get(etag)
+            if body is None:
+                body = str(request.render(template, prepare_values()).render()).encode()
+                portal_render_cache.set(etag, body)
+            response = request.make_response(body, headers=[("Content-Type", "text/html; charset=utf-8")])
+        response.set_etag(etag)
+        if last_modified:
+            response.last_modified = last_modified
+        # Let the browser keep the page but revalidate it on every visit.
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+
     def _prepare_home_portal_values(self, counters):
         values = super()._prepare_home_portal_values(counters)
-        if "lease_count" in counters:
-            partner = request.env.user.partner_id.commercial_partner_id
-            lease_count = request.env["property.lease"].search_count(
-                [("tenant_id", "child_of", partner.id)]
-            )
-            values["lease_count"] = lease_count
-        if "maintenance_count" in counters:
-            partner = request.env.user.partner_id.commercial_partner_id
-            maintenance_count = request.env["property.maintenance.request"].search_count(
-                [("tenant_id", "child_of", partner.id)]
+        if "lease_count" in counters or "maintenance_count" in counters:
+            tenant_counters = request.env["property.tenant.counter"]._get_counters(
+                request.env.user.partner_id
             )
-            values["maintenance_count"] = maintenance_count
+            if "lease_count" in counters:
+                values["lease_count"] = tenant_counters.lease_count
+            if "maintenance_count" in counters:
+                values["maintenance_count"] = tenant_counters.maintenance_count
         return values
 
     @http.route(["/my/leases"], type="http", auth="user", website=True)
-    def portal_my_leases(self, page=1, **kw):
+    @track_route("/my/leases")
+    def portal_my_leases(self, after=None, before=None, **kw):
+        return self._render_my_leases(False, after, before)
+
+    @http.route(["/my/leases/history"], type="http", auth="user", website=True)
+    def portal_my_leases_history(self, after=None, before=None, **kw):
+        return self._render_my_leases(True, after, before)
+
+    def _render_my_leases(self, history, after, before):
         partner = request.env.user.partner_id.commercial_partner_id
-        Lease = request.env["property.lease"]
-        domain = [("tenant_id", "child_of", partner.id)]
-        total = Lease.search_count(domain)
-        pager = portal_pager(
-            url="/my/leases",
-            total=total,
-            page=page,
-            step=20,
-        )
-        leases = Lease.search(
-            domain, order="start_date desc, id desc", limit=20, offset=pager["offset"]
+        domain = [("tenant_commercial_partner_id", "=", partner.id)]
+        if history:
+            Lease = request.env["property.lease"].with_context(active_test=False)
+            domain.append(("active", "=", False))
+        else:
+            Lease = request.env["property.lease"]
+
+        def prepare_values():
+            leases, pager = keyset_page(
+                Lease,
+                domain,
+                "start_date",
+                ["name", "unit_id", "start_date", "end_date", "rent_amount", "state"],
+                "/my/leases/history" if history else "/my/leases",
+                after=after,
+                before=before,
+            )
+            # Units of ended leases are outside the unit rule: prefetch their names.
+            leases.unit_id.sudo().fetch(["name"])
+            if history:
+                pager["total"] = Lease.search_count(domain)
+            else:
+                pager["total"] = request.env["property.tenant.counter"]._get_counters(partner).lease_count
+            return {
+                "leases": leases,
+                "history": history,
+                "page_name": "leases",
+                "pager": pager,
+            }
+
+        return self._render_cached(
+            "property_tent_portal.portal_my_leases",
+            [self._get_page_version(Lease, domain)],
+            prepare_values,
         )
-        values = {
-            "leases": leases,
-            "page_name": "leases",
-            "pager": pager,
-        }
-        return request.render("property_tent_portal.portal_my_leases", values)
 
     @http.route(["/my/leases/<int:lease_id>"], type="http", auth="user", website=True)
-    def portal_lease_detail(self, lease_id, **kw):
+    @track_route("/my/leases/<id>")
+    def portal_lease_detail(self, lease_id, after=None, before=None, **kw):
         lease = self._document_check_access("property.lease", lease_id)
-        invoices = request.env["account.move"].search(
-            [("property_lease_id", "=", lease.id)], order="invoice_date desc, id desc"
+        Move = request.env["account.move"]
+        domain = [("property_lease_id", "=", lease.id), ("invoice_date", "!=", False)]
+
+        def prepare_values():
+            invoices, pager = keyset_page(
+                Move,
+                domain,
+                "invoice_date",
+                ["name", "invoice_date", "invoice_date_due", "amount_total", "amount_residual", "state", "access_token"],
+                "/my/leases/%s" % lease.id,
+                after=after,
+                before=before,
+            )
+            [(billed, outstanding)] = Move._read_group(
+                domain + [("state", "=", "posted")],
+                aggregates=["amount_total_signed:sum", "amount_residual_signed:sum"],
+            )
+            billed, outstanding = billed or 0.0, outstanding or 0.0
+            return {
+                "lease": lease,
+                "invoices": invoices,
+                "pager": pager,
+                "summary": {
+                    "billed": billed,
+                    "paid": billed - outstanding,
+                    "outstanding": outstanding,
+                },
+                "page_name": "leases",
+            }
+
+        return self._render_cached(
+            "property_tent_portal.portal_lease_detail",
+            [(lease.write_date, 1), self._get_page_version(Move, domain)],
+            prepare_values,
         )
-        values = {
-            "lease": lease,
-            "invoices": invoices,
-            "page_name": "leases",
-        }
-        return request.render("property_tent_portal.portal_lease_detail", values)
 
     @http.route(["/my/maintenance"], type="http", auth="user", website=True)
-    def portal_my_maintenance(self, page=1, **kw):
+    @track_route("/my/maintenance")
+    def portal_my_maintenance(self, after=None, before=None, **kw):
+        return self._render_my_maintenance(False, after, before)
+
+    @http.route(["/my/maintenance/history"], type="http", auth="user", website=True)
+    def portal_my_maintenance_history(self, after=None, before=None, **kw):
+        return self._render_my_maintenance(True, after, before)
+
+    def _render_my_maintenance(self, history, after, before):
         partner = request.env.user.partner_id.commercial_partner_id
-        Request = request.env["property.maintenance.request"]
-        domain = [("tenant_id", "child_of", partner.id)]
-        total = Request.search_count(domain)
-        pager = portal_pager(
-            url="/my/maintenance",
-            total=total,
-            page=page,
-            step=20,
-        )
-        requests = Request.search(
-            domain, order="request_date desc, id desc", limit=20, offset=pager["offset"]
+        Photo = request.env["property.maintenance.photo"].sudo()
+        domain = [("tenant_commercial_partner_id", "=", partner.id)]
+        if history:
+            MaintenanceRequest = request.env["property.maintenance.request"].with_context(active_test=False)
+            domain.append(("active", "=", False))
+        else:
+            MaintenanceRequest = request.env["property.maintenance.request"]
+
+        def prepare_values():
+            requests, pager = keyset_page(
+                MaintenanceRequest,
+                domain,
+                "request_date",
+                ["name", "unit_id", "request_date", "issue_type", "state"],
+                "/my/maintenance/history" if history else "/my/maintenance",
+                after=after,
+                before=before,
+            )
+            requests.unit_id.sudo().fetch(["name"])
+            if history:
+                pager["total"] = MaintenanceRequest.search_count(domain)
+            else:
+                pager["total"] = request.env["property.tenant.counter"]._get_counters(partner).maintenance_count
+            thumbnails = {}
+            photos = Photo.search_fetch(
+                [("request_id", "in", requests.ids), ("thumbnail_state", "=", "done")], ["request_id"]
+            )
+            for photo in photos:
+                thumbnails.setdefault(photo.request_id.id, photo.id)
+            return {
+                "requests": requests,
+                "thumbnails": thumbnails,
+                "history": history,
+                "page_name": "maintenance",
+                "pager": pager,
+            }
+
+        return self._render_cached(
+            "property_tent_portal.portal_my_maintenance",
+            [
+                self._get_page_version(MaintenanceRequest, domain),
+                # Thumbnails are built in the background after the request is filed.
+                self._get_page_version(Photo, [("request_id.tenant_commercial_partner_id", "=", partner.id)]),
+            ],
+            prepare_values,
         )
-        values = {
-            "requests": requests,
-            "page_name": "maintenance",
-            "pager": pager,
-        }
-        return request.render("property_tent_portal.portal_my_maintenance", values)
 
     @http.route(["/my/maintenance/new"], type="http", auth="user", website=True)
     def portal_new_maintenance(self, **kw):
         partner = request.env.user.partner_id.commercial_partner_id
-        units = request.env["property.unit"].search(
-            [("lease_ids.tenant_id", "child_of", partner.id)]
-        )
+        Unit = request.env["property.unit"]
+        units = Unit.browse(sorted(Unit._get_tenant_unit_ids(partner.id)))
+        units.sudo().fetch(["name"])
         values = {
             "units": units,
             "page_name": "maintenance",
@@ -95,13 +344,47 @@ class TenantPortal(CustomerPortal):
         request_rec = self._document_check_access(
             "property.maintenance.request", request_id
         )
-        values = {
-            "request_rec": request_rec,
-            "page_name": "maintenance",
-        }
-        return request.render("property_tent_portal.portal_maintenance_detail", values)
+        photos = request_rec.sudo().photo_ids
+        return self._render_cached(
+            "property_tent_portal.portal_maintenance_detail",
+            [(request_rec.write_date, 1), (max(photos.mapped("write_date"), default=None), len(photos))],
+            lambda: {
+                "request_rec": request_rec,
+                "photos": photos,
+                "page_name": "maintenance",
+            },
+        )
 
-    @http.route(["/my/maintenance/create"], type="http", auth="user", website=True, methods=["POST"])
+    @http.route(
+        [
+            "/my/maintenance/<int:request_id>/photo/<int:photo_id>",
+            "/my/maintenance/<int:request_id>/photo/<int:photo_id>/<string:variant>",
+        ],
+        type="http",
+        auth="user",
+        website=True,
+    )
+    def portal_maintenance_photo(self, request_id, photo_id, variant=None, **kw):
+        request_rec = self._document_check_access(
+            "property.maintenance.request", request_id
+        )
+        photo = request_rec.sudo().photo_ids.filtered(lambda p: p.id == photo_id)
+        if not photo:
+            raise request.not_found()
+        if variant == "thumbnail" and photo.thumbnail_state == "done":
+            stream = request.env["ir.binary"]._get_image_stream_from(photo, "thumbnail")
+        else:
+            stream = request.env["ir.binary"]._get_stream_from(photo.attachment_id)
+        return stream.get_response()
+
+    @http.route(
+        ["/my/maintenance/create"],
+        type="http",
+        auth="user",
+        website=True,
+        methods=["POST"],
+        max_content_length=lambda controller: request.env["property.maintenance.photo"]._max_request_size(),
+    )
     def portal_create_maintenance(self, **post):
         partner = request.env.user.partner_id.commercial_partner_id
         unit_id = int(post.get("unit_id") or 0)
@@ -109,10 +392,7 @@ class TenantPortal(CustomerPortal):
         issue_type = post.get("issue_type") or "other"
         if not unit_id or not description:
             return request.redirect("/my/maintenance/new?error=1")
-        allowed_units = request.env["property.unit"].search(
-            [("lease_ids.tenant_id", "child_of", partner.id)]
-        )
-        if unit_id not in allowed_units.ids:
+        if unit_id not in request.env["property.unit"]._get_tenant_unit_ids(partner.id):
             return request.redirect("/my/maintenance/new?error=1")
         req_vals = {
             "tenant_id": partner.id,
@@ -120,10 +400,14 @@ class TenantPortal(CustomerPortal):
             "issue_type": issue_type,
             "description": description,
         }
-        upload = request.httprequest.files.get("photo")
-        if upload and upload.filename:
-            import base64
-            req_vals["photo"] = base64.b64encode(upload.read())
-            req_vals["photo_filename"] = upload.filename
-        request.env["property.maintenance.request"].create(req_vals)
+        files = request.httprequest.files
+        uploads = files.getlist("photos") + files.getlist("photo")
+        try:
+            with request.env.cr.savepoint():
+                maintenance_request = request.env["property.maintenance.request"].create(req_vals)
+                request.env["property.maintenance.photo"]._create_from_uploads(
+                    maintenance_request, uploads
+                )
+        except ValidationError:
+            return request.redirect("/my/maintenance/new?error=%s" % ("photo" if uploads else 1))
         return request.redirect("/my/maintenance")
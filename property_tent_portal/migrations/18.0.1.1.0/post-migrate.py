@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+
+
+def migrate(cr, version):
+    # Rent invoices used to be dated on their period: record it, so the
+    # duplicate period check sees the invoices created before the upgrade.
+    cr.execute(
+        """
+        UPDATE account_move
+           SET rent_period_date = invoice_date
+         WHERE property_lease_id IS NOT NULL
+           AND rent_period_date IS NULL
+           AND invoice_date IS NOT NULL
+        """
+    )
+    # The sent flags of account.move are now derived from the SMS ledger:
+    # record the messages flagged as sent that have no ledger row yet.
+    cr.execute(
+        """
+        INSERT INTO property_rent_sms (
+            move_id, partner_id, kind, state, attempt_count, next_attempt_at, sent_at,
+            create_date, write_date
+        )
+        SELECT move.id, move.partner_id, flag.kind, 'sent', 0, move.write_date, move.write_date,
+               now() AT TIME ZONE 'UTC', now() AT TIME ZONE 'UTC'
+          FROM account_move move
+         CROSS JOIN LATERAL (
+                VALUES ('due', move.rent_sms_due_sent),
+                       ('overdue', move.rent_sms_overdue_sent),
+                       ('paid', move.rent_sms_paid_sent)
+               ) AS flag(kind, sent)
+         WHERE flag.sent
+            ON CONFLICT (move_id, kind) DO NOTHING
+        """
+    )
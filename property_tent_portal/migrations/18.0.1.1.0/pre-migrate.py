@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+from odoo.tools.sql import table_exists
+
+
+def migrate(cr, version):
+    # The SMS ledger is new in this version on databases coming from 18.0.1.0.0.
+    if not table_exists(cr, "property_rent_sms"):
+        return
+    # Keep a single queued message per invoice and type, preferring the one
+    # already sent, so the new unique constraint can be created.
+    cr.execute(
+        """
+        DELETE FROM property_rent_sms
+         WHERE id IN (
+                SELECT id
+                  FROM (SELECT id,
+                               row_number() OVER (
+                                   PARTITION BY move_id, kind
+                                   ORDER BY state = 'sent' DESC, id
+                               ) AS rank
+                          FROM property_rent_sms) ranked
+                 WHERE rank > 1
+               )
+        """
+    )
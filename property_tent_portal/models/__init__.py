@@ -1,5 +1,18 @@
+from . import ir_cron
+from . import ir_sequence
+from . import res_partner
 from . import property
 from . import unit
 from . import lease
+from . import lease_import
+from . import lease_lifecycle_log
 from . import account_move
 from . import maintenance
+from . import maintenance_photo
+from . import rent_sms
+from . import tenant_counter
+from . import rent_roll_report
+from . import arrears_snapshot
+from . import perf_metrics
+from . import archive
+from . import statement_export
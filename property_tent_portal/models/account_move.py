@@ -1,7 +1,14 @@
 # -*- coding: utf-8 -*-
+import uuid
 from datetime import timedelta
 
 from odoo import api, fields, models
+from odoo.exceptions import AccessError, MissingError
+from odoo.tools import SQL
+from odoo.tools.sql import create_index
+
+# Payment states in which the tenant gets the "Payment received" SMS.
+RENT_PAID_STATES = ("paid", "in_payment")
 
 
 class AccountMove(models.Model):
@@ -9,10 +16,38 @@ class AccountMove(models.Model):
 
     property_lease_id = fields.Many2one("property.lease", string="Lease")
     property_unit_id = fields.Many2one("property.unit", string="Unit")
+    rent_period_date = fields.Date(string="Rent Period", copy=False)
+
+    rent_sms_queue_ids = fields.One2many("property.rent.sms", "move_id", string="Rent SMS")
+    rent_sms_due_sent = fields.Boolean(compute="_compute_rent_sms_sent")
+    rent_sms_overdue_sent = fields.Boolean(compute="_compute_rent_sms_sent")
+    rent_sms_paid_sent = fields.Boolean(compute="_compute_rent_sms_sent")
 
-    rent_sms_due_sent = fields.Boolean(default=False)
-    rent_sms_overdue_sent = fields.Boolean(default=False)
-    rent_sms_paid_sent = fields.Boolean(default=False)
+    def init(self):
+        super().init()
+        create_index(
+            self.env.cr,
+            "account_move_property_lease_invoice_date_idx",
+            self._table,
+            ["property_lease_id", "invoice_date DESC", "id DESC"],
+            where="property_lease_id IS NOT NULL",
+        )
+        create_index(
+            self.env.cr,
+            "account_move_open_rent_invoice_due_idx",
+            self._table,
+            ["invoice_date_due"],
+            where="move_type = 'out_invoice' AND state = 'posted' AND payment_state NOT IN (%s) "
+            "AND property_lease_id IS NOT NULL" % ", ".join("'%s'" % state for state in RENT_PAID_STATES),
+        )
+
+    @api.depends("rent_sms_queue_ids.kind", "rent_sms_queue_ids.state")
+    def _compute_rent_sms_sent(self):
+        for move in self:
+            sent_kinds = set(move.rent_sms_queue_ids.filtered(lambda sms: sms.state == "sent").mapped("kind"))
+            move.rent_sms_due_sent = "due" in sent_kinds
+            move.rent_sms_overdue_sent = "overdue" in sent_kinds
+            move.rent_sms_paid_sent = "paid" in sent_kinds
 
     def _send_rent_sms(self, body):
         for move in self:
@@ -42,10 +77,14 @@ class AccountMove(models.Model):
 
     def _build_overdue_sms(self):
         ctx = self._get_rent_sms_context()
-        return (
+        body = (
             f"Overdue rent: {ctx['unit']} was due on {ctx['due_date']}. "
             f"Amount: {ctx['amount']:.2f}. Ref {ctx['invoice']}."
         )
+        arrears = self.property_lease_id.arrears_snapshot_ids[:1].amount_total
+        if arrears > ctx["amount"]:
+            body += f" Total overdue: {arrears:.2f}."
+        return body
 
     def _build_paid_sms(self):
         ctx = self._get_rent_sms_context()
@@ -60,45 +99,147 @@ class AccountMove(models.Model):
 
     @api.model
     def cron_send_rent_sms_reminders(self):
-        today = fields.Date.context_today(self)
-        due_days = self._rent_due_reminder_days()
-        due_date = today + timedelta(days=due_days)
-        domain_base = [
-            ("move_type", "=", "out_invoice"),
-            ("state", "=", "posted"),
-            ("payment_state", "!=", "paid"),
-            ("property_lease_id", "!=", False),
-            ("invoice_date_due", "!=", False),
-        ]
-        due_moves = self.search(domain_base + [("invoice_date_due", "=", due_date), ("rent_sms_due_sent", "=", False)])
-        for move in due_moves:
-            move._send_rent_sms(move._build_due_sms())
-            move.rent_sms_due_sent = True
-
-        overdue_moves = self.search(domain_base + [("invoice_date_due", "<", today), ("rent_sms_overdue_sent", "=", False)])
-        for move in overdue_moves:
-            move._send_rent_sms(move._build_overdue_sms())
-            move.rent_sms_overdue_sent = True
+        with self.env["property.perf.run"]._track("rent_sms_reminders") as run:
+            today = fields.Date.context_today(self)
+            due_days = self._rent_due_reminder_days()
+            due_date = today + timedelta(days=due_days)
+            run["processed"] = len(self.env["property.rent.sms"]._enqueue_reminders(due_date, today))
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        moves = super().create(vals_list)
+        self.env["property.tenant.counter"]._mark_dirty(moves.filtered("property_lease_id").partner_id)
+        return moves
 
     def write(self, vals):
+        counter_fields = {"partner_id", "property_lease_id", "state", "move_type"}
+        track_counters = not counter_fields.isdisjoint(vals)
+        if track_counters:
+            self.env["property.tenant.counter"]._mark_dirty(self.filtered("property_lease_id").partner_id)
         res = super().write(vals)
+        if track_counters:
+            self.env["property.tenant.counter"]._mark_dirty(self.filtered("property_lease_id").partner_id)
         if "payment_state" in vals:
-            paid_moves = self.filtered(
-                lambda m: m.payment_state == "paid"
-                and m.property_lease_id
-                and not m.rent_sms_paid_sent
-            )
-            for move in paid_moves:
-                move._send_rent_sms(move._build_paid_sms())
-                move.rent_sms_paid_sent = True
+            self._schedule_paid_rent_sms()
         return res
 
+    def unlink(self):
+        self.env["property.tenant.counter"]._mark_dirty(self.filtered("property_lease_id").partner_id)
+        return super().unlink()
+
+    def _compute_payment_state(self):
+        # Reconciliation, batch and online payments update payment_state
+        # through this compute, not write(): compare with the value it had
+        # to catch the rent invoices whose payment state changed.
+        rent_invoices = self.filtered(
+            lambda m: m.id and m.property_lease_id and m.move_type == "out_invoice"
+        )
+        previous_states = rent_invoices._get_previous_payment_states()
+        super()._compute_payment_state()
+        changed = rent_invoices.filtered(lambda m: m.payment_state != previous_states.get(m.id))
+        if changed:
+            self.env["property.tenant.counter"]._mark_dirty(changed.partner_id)
+            changed.filtered(
+                lambda m: m.payment_state in RENT_PAID_STATES and previous_states.get(m.id) not in RENT_PAID_STATES
+            )._schedule_paid_rent_sms()
+
+    def _get_previous_payment_states(self):
+        """Map the ids of ``self`` to their payment state before the recompute.
+
+        The value still in cache is used; only the moves whose state was
+        never loaded are read from the database.
+        """
+        field = self._fields["payment_state"]
+        states = {}
+        for move in self:
+            state = self.env.cache.get(move, field, None)
+            if state is not None:
+                states[move.id] = state
+        missing_ids = [move_id for move_id in self.ids if move_id not in states]
+        if missing_ids:
+            self.env.cr.execute(
+                SQL("SELECT id, payment_state FROM %s WHERE id = ANY(%s)", SQL.identifier(self._table), missing_ids)
+            )
+            states.update(self.env.cr.fetchall())
+        return states
+
+    def _schedule_paid_rent_sms(self):
+        """Queue the "Payment received" SMS of ``self`` once the transaction commits.
+
+        Moves are collected per transaction, so a move paid several times
+        in the same transaction is queued once, and the whole set is
+        enqueued with a single batch right before commit.
+        """
+        paid_moves = self.filtered(lambda m: m.payment_state in RENT_PAID_STATES and m.property_lease_id)
+        if not paid_moves:
+            return
+        precommit = self.env.cr.precommit
+        if "property_tent_portal.paid_sms" not in precommit.data:
+            precommit.data["property_tent_portal.paid_sms"] = set()
+            precommit.add(self._enqueue_paid_rent_sms)
+        precommit.data["property_tent_portal.paid_sms"].update(paid_moves.ids)
+
+    def _enqueue_paid_rent_sms(self):
+        move_ids = self.env.cr.precommit.data.pop("property_tent_portal.paid_sms", set())
+        moves = self.sudo().browse(move_ids).exists().filtered(lambda m: m.payment_state in RENT_PAID_STATES)
+        # Moves already confirmed are skipped by the ledger's unique constraint.
+        self.env["property.rent.sms"].sudo()._enqueue(moves, "paid")
+        self.env.flush_all()
+
+    def _post(self, soft=True):
+        posted = super()._post(soft=soft)
+        posted.filtered(lambda m: m.property_lease_id and m.move_type == "out_invoice")._generate_access_tokens()
+        return posted
+
+    def _generate_access_tokens(self):
+        """Give every move of ``self`` lacking one a portal access token, in one statement.
+
+        Rent invoices get their token when posted, so the portal and payment
+        paths only ever read it and never lock the invoice row to write one.
+        """
+        missing = self.filtered(lambda m: not m.access_token)
+        if not missing:
+            return
+        self.env.cr.execute(
+            SQL(
+                """
+                UPDATE %(table)s AS move
+                   SET access_token = token.value
+                  FROM (VALUES %(values)s) AS token(id, value)
+                 WHERE move.id = token.id
+                   AND move.access_token IS NULL
+                """,
+                table=SQL.identifier(self._table),
+                values=SQL(", ").join(SQL("(%s, %s)", move.id, str(uuid.uuid4())) for move in missing),
+            )
+        )
+        missing.invalidate_recordset(["access_token"])
+
+    @api.model
+    def _get_payment_access_token(self, invoice_id):
+        """Return the access token of invoice ``invoice_id`` if the current user can read it.
+
+        The check is a single search under the user's access rules, and its
+        result is cached on the cursor for the rest of the request.
+        """
+        cache = self.env.cr.cache
+        key = ("property_tent_portal.payment_access_token", self.env.uid, invoice_id)
+        if key not in cache:
+            invoice = self.search_fetch([("id", "=", invoice_id)], ["access_token"], limit=1)
+            if not invoice:
+                if not self.sudo().browse(invoice_id).exists():
+                    raise MissingError("This document does not exist.")
+                raise AccessError("You are not allowed to access this document.")
+            # Invoices posted before tokens were pre-generated get one now.
+            cache[key] = invoice.access_token or invoice._portal_ensure_token()
+        return cache[key]
+
     def get_portal_url(self, suffix=None, report_type=None, download=False, **kwargs):
         url = super().get_portal_url(
             suffix=suffix, report_type=report_type, download=download, **kwargs
         )
         if "access_token=" not in url:
-            token = self._portal_ensure_token()
+            token = self.access_token or self._portal_ensure_token()
             sep = "&" if "?" in url else "?"
             url = f"{url}{sep}access_token={token}"
         return url
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import logging
+from datetime import timedelta
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+ARCHIVE_AFTER_DAYS_PARAM = "property_tent_portal.archive_after_days"
+
+
+class PropertyArchive(models.AbstractModel):
+    _name = "property.archive"
+    _description = "Property Rental Archival"
+
+    @api.model
+    def _archive_after_days(self):
+        return int(self.env["ir.config_parameter"].sudo().get_param(ARCHIVE_AFTER_DAYS_PARAM, 365))
+
+    @api.model
+    def _archive_batch_size(self):
+        return 1000
+
+    @api.model
+    def _archive_records(self, records_getter, archive):
+        """Archive, chunk by chunk, the records returned by ``records_getter`` until none is left."""
+        count = 0
+        while records := records_getter(self._archive_batch_size()):
+            archive(records)
+            count += len(records)
+            self.env["ir.cron"]._commit_progress()
+            self.env.invalidate_all()
+        return count
+
+    @api.model
+    def cron_archive_history(self):
+        """Archive the ended leases and closed maintenance requests past the archival age.
+
+        Archived records leave the partial indexes of the live set and the
+        portal lists, and remain readable from the portal history pages.
+        Each chunk is committed, so an interrupted run resumes where it
+        stopped.
+        """
+        with self.env["property.perf.run"]._track("archive_history") as run:
+            cutoff = fields.Date.context_today(self) - timedelta(days=self._archive_after_days())
+            Lease = self.env["property.lease"]
+            lease_count = self._archive_records(
+                lambda limit: Lease.search(
+                    [
+                        ("state", "=", "ended"),
+                        "|",
+                        ("end_date", "<", cutoff),
+                        "&",
+                        ("end_date", "=", False),
+                        ("write_date", "<", cutoff),
+                    ],
+                    limit=limit,
+                ),
+                lambda leases: leases.action_archive(),
+            )
+
+            def archive_requests(requests):
+                requests._compact_legacy_photos()
+                requests.action_archive()
+
+            MaintenanceRequest = self.env["property.maintenance.request"]
+            request_count = self._archive_records(
+                lambda limit: MaintenanceRequest.search(
+                    [("state", "=", "done"), ("write_date", "<", cutoff)],
+                    limit=limit,
+                ),
+                archive_requests,
+            )
+            run["processed"] = lease_count + request_count
+            _logger.info("Archived %s leases and %s maintenance requests", lease_count, request_count)
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+import threading
+
+from odoo import api, models
+
+
+class IrCron(models.Model):
+    _inherit = "ir.cron"
+
+    @api.model
+    def _auto_commit_enabled(self):
+        """Whether scheduled jobs may commit their work chunk by chunk.
+
+        Disabled under tests, and by callers setting ``cron_auto_commit`` to
+        False in the context, so a whole run can be exercised and rolled
+        back inside one transaction.
+        """
+        return self.env.context.get("cron_auto_commit", not getattr(threading.current_thread(), "testing", False))
+
+    @api.model
+    def _commit_progress(self):
+        """Commit the chunk a scheduled job just processed, when auto-commit is enabled.
+
+        Returns whether the transaction was committed.
+        """
+        if not self._auto_commit_enabled():
+            return False
+        self.env.cr.commit()
+        return True
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+from odoo import api, models
+from odoo.tools import SQL
+
+
+class IrSequence(models.Model):
+    _inherit = "ir.sequence"
+
+    @api.model
+    def _next_by_code_batch(self, sequence_code, count):
+        """Reserve ``count`` numbers of the sequence ``sequence_code`` at once.
+
+        Returns the formatted values in order, like ``count`` calls to
+        ``next_by_code`` but with a single round trip to the database.
+        """
+        if count <= 0:
+            return []
+        self.check_access("read")
+        sequence = self.search(
+            [("code", "=", sequence_code), ("company_id", "in", [self.env.company.id, False])],
+            order="company_id",
+            limit=1,
+        )
+        if not sequence or sequence.use_date_range:
+            return [self.next_by_code(sequence_code) for _i in range(count)]
+        increment = sequence.number_increment
+        if sequence.implementation == "standard":
+            self.env.cr.execute(
+                SQL(
+                    "SELECT nextval(%s) FROM generate_series(1, %s)",
+                    "ir_sequence_%03d" % sequence.id,
+                    count,
+                )
+            )
+            numbers = [row[0] for row in self.env.cr.fetchall()]
+        else:
+            self.env.cr.execute(
+                SQL(
+                    "UPDATE ir_sequence SET number_next = number_next + %s WHERE id = %s RETURNING number_next",
+                    count * increment,
+                    sequence.id,
+                )
+            )
+            last = self.env.cr.fetchone()[0]
+            numbers = range(last - count * increment, last, increment)
+            sequence.invalidate_recordset(["number_next"])
+        return [sequence.get_next_char(number) for number in numbers]
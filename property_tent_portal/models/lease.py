@@ -1,8 +1,16 @@
 # -*- coding: utf-8 -*-
+import logging
+import time
+from collections import defaultdict
+
 from dateutil.relativedelta import relativedelta
 
 from odoo import api, fields, models
 from odoo.exceptions import UserError
+from odoo.tools import SQL
+from odoo.tools.sql import create_index
+
+_logger = logging.getLogger(__name__)
 
 
 class PropertyLease(models.Model):
@@ -12,9 +20,15 @@ class PropertyLease(models.Model):
     _order = "start_date desc, id desc"
 
     name = fields.Char(default="New", copy=False, readonly=True)
-    unit_id = fields.Many2one("property.unit", required=True, ondelete="cascade")
-    property_id = fields.Many2one(related="unit_id.property_id", store=True, readonly=True)
-    tenant_id = fields.Many2one("res.partner", required=True)
+    unit_id = fields.Many2one("property.unit", required=True, ondelete="cascade", index=True)
+    property_id = fields.Many2one(related="unit_id.property_id", store=True, readonly=True, index=True)
+    tenant_id = fields.Many2one("res.partner", required=True, index=True)
+    tenant_commercial_partner_id = fields.Many2one(
+        related="tenant_id.commercial_partner_id",
+        string="Tenant Company",
+        store=True,
+        index=True,
+    )
 
     start_date = fields.Date(required=True)
     end_date = fields.Date()
@@ -29,14 +43,21 @@ class PropertyLease(models.Model):
         domain=[("sale_ok", "=", True)],
     )
 
+    auto_renew = fields.Boolean()
+    renewal_months = fields.Integer(default=12)
+
     next_invoice_date = fields.Date()
     last_invoice_date = fields.Date()
+    invoice_template = fields.Json(copy=False, readonly=True)
 
     state = fields.Selection(
         [("draft", "Draft"), ("active", "Active"), ("ended", "Ended")],
         default="draft",
         required=True,
     )
+    active = fields.Boolean(default=True)
+
+    arrears_snapshot_ids = fields.One2many("property.arrears.snapshot", "lease_id")
 
     company_id = fields.Many2one(
         "res.company", required=True, default=lambda self: self.env.company
@@ -45,6 +66,34 @@ class PropertyLease(models.Model):
         related="company_id.currency_id", store=True, readonly=True
     )
 
+    def init(self):
+        super().init()
+        # Portal lease list: keyset pagination within one tenant. The portal
+        # indexes only cover unarchived leases.
+        create_index(
+            self.env.cr,
+            "property_lease_tenant_start_date_idx",
+            self._table,
+            ["tenant_commercial_partner_id", "start_date DESC", "id DESC"],
+            where="active",
+        )
+        # Current lease of units and active lease of maintenance requests.
+        create_index(
+            self.env.cr,
+            "property_lease_unit_state_idx",
+            self._table,
+            ["unit_id", "state", "start_date DESC"],
+            where="active",
+        )
+        # Rent invoicing claims.
+        create_index(
+            self.env.cr,
+            "property_lease_due_idx",
+            self._table,
+            ["next_invoice_date", "company_id", "id"],
+            where="state = 'active'",
+        )
+
     @api.onchange("unit_id")
     def _onchange_unit_id(self):
         for rec in self:
@@ -53,14 +102,29 @@ class PropertyLease(models.Model):
 
     @api.model_create_multi
     def create(self, vals_list):
+        to_number = [vals for vals in vals_list if vals.get("name", "New") == "New"]
+        names = self.env["ir.sequence"]._next_by_code_batch("property.lease", len(to_number))
+        for vals, name in zip(to_number, names):
+            vals["name"] = name or "New"
         for vals in vals_list:
-            if vals.get("name", "New") == "New":
-                vals["name"] = (
-                    self.env["ir.sequence"].next_by_code("property.lease") or "New"
-                )
             if not vals.get("next_invoice_date") and vals.get("start_date"):
                 vals["next_invoice_date"] = vals["start_date"]
-        return super().create(vals_list)
+        leases = super().create(vals_list)
+        self.env["property.tenant.counter"]._mark_dirty(leases.tenant_id)
+        return leases
+
+    def write(self, vals):
+        if "tenant_id" in vals:
+            self.env["property.tenant.counter"]._mark_dirty(self.tenant_id)
+        res = super().write(vals)
+        # The counters' refresh also invalidates the cached units of the tenant.
+        if {"tenant_id", "unit_id", "state", "active"} & vals.keys():
+            self.env["property.tenant.counter"]._mark_dirty(self.tenant_id)
+        return res
+
+    def unlink(self):
+        self.env["property.tenant.counter"]._mark_dirty(self.tenant_id)
+        return super().unlink()
 
     def action_activate(self):
         self.write({"state": "active"})
@@ -68,56 +132,422 @@ class PropertyLease(models.Model):
     def action_end(self):
         self.write({"state": "ended"})
 
-    def _prepare_invoice_values(self, invoice_date):
+    def _get_invoice_accounting(self, fiscal_position):
+        """Return the taxes and the income account of the rent line under ``fiscal_position``."""
+        self.ensure_one()
+        company = self.company_id
+        product = self.rent_product_id.with_company(company)
+        taxes = product.taxes_id.filtered_domain(self.env["account.tax"]._check_company_domain(company))
+        account = product.product_tmpl_id.get_product_accounts(fiscal_pos=fiscal_position)["income"]
+        return fiscal_position.map_tax(taxes), account
+
+    def _get_invoice_template_fingerprint(self, journal, fiscal_position):
+        """Return a key that changes whenever a value of the invoice template may change."""
+        self.ensure_one()
+        product = self.rent_product_id
+        taxes, account = self._get_invoice_accounting(fiscal_position)
+        return "|".join(
+            str(value)
+            for value in (
+                self.company_id.id,
+                self.tenant_id.id,
+                self.unit_id.name,
+                journal.id,
+                journal.write_date,
+                product.id,
+                product.write_date,
+                product.product_tmpl_id.write_date,
+                product.categ_id.write_date,
+                self.tenant_id.write_date,
+                fiscal_position.write_date,
+                taxes.ids,
+                taxes.mapped("write_date"),
+                account.id,
+                account.write_date,
+            )
+        )
+
+    def _build_invoice_template(self, journal):
+        """Resolve the values shared by every rent invoice of the lease."""
         self.ensure_one()
         if not self.rent_product_id:
             raise UserError("Please set a rent product on the lease contract.")
-        line_name = "Rent for %s (%s)" % (self.unit_id.name, invoice_date.strftime("%B %Y"))
+        company = self.company_id
+        product = self.rent_product_id.with_company(company)
+        fiscal_position = self.env["account.fiscal.position"].with_company(company)._get_fiscal_position(
+            self.tenant_id
+        )
+        taxes, account = self._get_invoice_accounting(fiscal_position)
         return {
-            "move_type": "out_invoice",
+            "fingerprint": self._get_invoice_template_fingerprint(journal, fiscal_position),
+            "journal_id": journal.id,
+            "fiscal_position_id": fiscal_position.id,
+            "currency_id": self.currency_id.id,
             "partner_id": self.tenant_id.id,
+            "unit_name": self.unit_id.name,
+            "product_id": product.id,
+            "product_uom_id": product.uom_id.id,
+            "account_id": account.id,
+            "tax_ids": taxes.ids,
+        }
+
+    def _get_invoice_templates(self):
+        """Return the invoice template of each lease, rebuilding the stale ones.
+
+        A template is rebuilt only when its fingerprint no longer matches the
+        lease, tenant, sale journal, product, taxes, income account or fiscal
+        position it was resolved from.
+        """
+        FiscalPosition = self.env["account.fiscal.position"]
+        fiscal_positions = FiscalPosition.browse(
+            {lease.invoice_template["fiscal_position_id"] for lease in self if lease.invoice_template}
+            - {False}
+        ).exists()
+        templates = {}
+        journals = {}
+        for lease in self:
+            company = lease.company_id
+            if company not in journals:
+                journals[company] = self.env["account.journal"].search(
+                    [*self.env["account.journal"]._check_company_domain(company), ("type", "=", "sale")],
+                    limit=1,
+                )
+            template = lease.invoice_template
+            if template and lease.rent_product_id:
+                fiscal_position = fiscal_positions.filtered(lambda fp: fp.id == template["fiscal_position_id"])
+                fingerprint = lease._get_invoice_template_fingerprint(journals[company], fiscal_position)
+                if template["fingerprint"] == fingerprint:
+                    templates[lease.id] = template
+                    continue
+            template = lease._build_invoice_template(journals[company])
+            lease.invoice_template = template
+            templates[lease.id] = template
+        return templates
+
+    def _prepare_invoice_values(self, invoice_date, template=None):
+        """Stamp the invoice of period ``invoice_date`` from the lease's invoice template.
+
+        The template already holds the resolved journal, fiscal position,
+        account and taxes, so the move is created without recomputing them.
+        """
+        self.ensure_one()
+        if template is None:
+            template = self._get_invoice_templates()[self.id]
+        line_name = "Rent for %s (%s)" % (template["unit_name"], invoice_date.strftime("%B %Y"))
+        line_vals = {
+            "product_id": template["product_id"],
+            "name": line_name,
+            "quantity": 1.0,
+            "price_unit": self.rent_amount,
+            "product_uom_id": template["product_uom_id"],
+            "tax_ids": [(6, 0, template["tax_ids"])],
+        }
+        if template["account_id"]:
+            line_vals["account_id"] = template["account_id"]
+        vals = {
+            "move_type": "out_invoice",
+            "partner_id": template["partner_id"],
+            "currency_id": template["currency_id"],
+            "fiscal_position_id": template["fiscal_position_id"],
             "invoice_date": invoice_date,
             "invoice_date_due": invoice_date,
             "invoice_origin": self.name,
             "property_lease_id": self.id,
+            "rent_period_date": invoice_date,
             "property_unit_id": self.unit_id.id,
-            "invoice_line_ids": [
-                (
-                    0,
-                    0,
-                    {
-                        "product_id": self.rent_product_id.id,
-                        "name": line_name,
-                        "quantity": 1.0,
-                        "price_unit": self.rent_amount,
-                    },
-                )
-            ],
+            "invoice_line_ids": [(0, 0, line_vals)],
         }
+        if template["journal_id"]:
+            vals["journal_id"] = template["journal_id"]
+        return vals
 
-    def action_generate_invoice(self, invoice_date=False):
+    def _get_rent_periods_due(self, until):
+        """Return, per lease id, every period date still to invoice up to ``until``."""
+        periods = {}
+        for lease in self:
+            dates = []
+            period = lease.next_invoice_date
+            while period and period <= until and not (lease.end_date and period > lease.end_date):
+                dates.append(period)
+                # Step from the anchor date so month-end dates do not drift.
+                period = lease.next_invoice_date + relativedelta(months=len(dates))
+            periods[lease.id] = dates
+        return periods
+
+    def _get_invoiced_periods(self, periods):
+        period_dates = list({period for dates in periods.values() for period in dates})
+        if not period_dates:
+            return set()
+        # Invoices created before rent periods were recorded fall back on
+        # their invoice date, which was the period date.
+        moves = self.env["account.move"].search_fetch(
+            [
+                ("property_lease_id", "in", self.ids),
+                ("state", "!=", "cancel"),
+                "|",
+                ("rent_period_date", "in", period_dates),
+                "&",
+                ("rent_period_date", "=", False),
+                ("invoice_date", "in", period_dates),
+            ],
+            ["property_lease_id", "rent_period_date", "invoice_date"],
+        )
+        return {(move.property_lease_id.id, move.rent_period_date or move.invoice_date) for move in moves}
+
+    def _generate_rent_invoices(self, periods):
+        """Create and post the rent invoices of ``self`` in one batch.
+
+        ``periods`` maps each lease id to the list of period dates to
+        invoice. Periods that already have an invoice are skipped, so the
+        method can safely be rerun. The lease dates are then written once
+        per distinct value.
+        """
+        invoiced = self._get_invoiced_periods(periods)
+        templates = self.filtered(lambda lease: periods.get(lease.id))._get_invoice_templates()
+        vals_list = [
+            lease._prepare_invoice_values(period, templates[lease.id])
+            for lease in self
+            for period in periods.get(lease.id, [])
+            if (lease.id, period) not in invoiced
+        ]
+        moves = self.env["account.move"].create(vals_list)
+        moves.filtered(lambda m: m.state == "draft").action_post()
+
+        lease_ids_by_dates = defaultdict(list)
         for lease in self:
-            if lease.state != "active":
-                continue
-            date_to_use = invoice_date or lease.next_invoice_date
-            if not date_to_use:
-                continue
-            move_vals = lease._prepare_invoice_values(date_to_use)
-            move = self.env["account.move"].create(move_vals)
-            if move.state == "draft":
-                move.action_post()
-            lease.last_invoice_date = date_to_use
-            lease.next_invoice_date = date_to_use + relativedelta(months=1)
+            dates = periods.get(lease.id)
+            if dates:
+                next_date = dates[0] + relativedelta(months=len(dates))
+                lease_ids_by_dates[dates[-1], next_date].append(lease.id)
+        for (last_date, next_date), lease_ids in lease_ids_by_dates.items():
+            self.browse(lease_ids).write(
+                {"last_invoice_date": last_date, "next_invoice_date": next_date}
+            )
+        return moves
+
+    def action_generate_invoice(self, invoice_date=False):
+        leases = self.filtered(
+            lambda lease: lease.state == "active" and (invoice_date or lease.next_invoice_date)
+        )
+        periods = {
+            lease.id: [invoice_date or lease.next_invoice_date] for lease in leases
+        }
+        leases._generate_rent_invoices(periods)
+
+    def action_generate_catchup_invoices(self):
+        today = fields.Date.context_today(self)
+        leases = self.filtered(lambda lease: lease.state == "active")
+        leases._generate_rent_invoices(leases._get_rent_periods_due(today))
 
     @api.model
-    def cron_generate_rent_invoices(self):
+    def _rent_invoice_batch_size(self):
+        return 500
+
+    @api.model
+    def _rent_invoice_partitions(self):
+        """Number of invoicing workers: the main cron and its sibling worker crons."""
+        return 4
+
+    @api.model
+    def _claim_due_leases(self, today, limit, exclude_ids, partition=None):
+        """Lock and return up to ``limit`` ids of leases due for invoicing.
+
+        With a ``partition``, only leases of the companies of that partition
+        are claimed. Rows already locked by another worker are skipped, so
+        concurrent workers always pick disjoint leases.
+        """
+        self.flush_model(["state", "next_invoice_date", "end_date", "company_id"])
+        self.env.cr.execute(self._get_due_leases_query(today, limit, exclude_ids, partition))
+        return [row[0] for row in self.env.cr.fetchall()]
+
+    @api.model
+    def _get_due_leases_query(self, today, limit, exclude_ids, partition=None):
+        partition_clause = SQL()
+        if partition is not None:
+            partition_clause = SQL(
+                "AND mod(company_id, %(partitions)s) = %(partition)s",
+                partitions=self._rent_invoice_partitions(),
+                partition=partition,
+            )
+        return SQL(
+            """
+            SELECT id
+              FROM %(table)s
+             WHERE state = 'active'
+               AND next_invoice_date <= %(today)s
+               AND (end_date IS NULL OR next_invoice_date <= end_date)
+               AND id != ALL(%(exclude_ids)s::int[])
+                   %(partition_clause)s
+          ORDER BY company_id, id
+             LIMIT %(limit)s
+               FOR UPDATE SKIP LOCKED
+            """,
+            table=SQL.identifier(self._table),
+            today=today,
+            exclude_ids=list(exclude_ids),
+            partition_clause=partition_clause,
+            limit=limit,
+        )
+
+    @api.model
+    def _run_rent_invoice_worker(self, partition=None):
+        """Invoice the due leases chunk by chunk, starting with the companies of ``partition``.
+
+        Companies are spread over the workers so that each one mostly posts
+        in journals of its own instead of queueing on the sequences of the
+        same company. Once its partition is done, a worker helps with the
+        leases left in the other partitions.
+        """
         today = fields.Date.context_today(self)
-        leases = self.search(
-            [
-                ("state", "=", "active"),
-                ("next_invoice_date", "!=", False),
-                ("next_invoice_date", "<=", today),
-            ]
+        batch_size = self._rent_invoice_batch_size()
+        stats = {"invoiced": 0, "failed": 0}
+        failed_ids = []
+        started = time.perf_counter()
+        while lease_ids := (
+            partition is not None and self._claim_due_leases(today, batch_size, failed_ids, partition)
+        ) or self._claim_due_leases(today, batch_size, failed_ids):
+            # Journals and sequences are per company: invoice each company
+            # of the chunk in its own environment.
+            for company, leases in self.browse(lease_ids).grouped("company_id").items():
+                leases = leases.with_company(company)
+                periods = leases._get_rent_periods_due(today)
+                try:
+                    with self.env.cr.savepoint():
+                        moves = leases._generate_rent_invoices(periods)
+                    stats["invoiced"] += len(moves)
+                except Exception:
+                    # One bad lease must not hold back the whole chunk: retry
+                    # the leases one by one to isolate the failing ones.
+                    _logger.warning("Rent invoice batch failed, retrying lease by lease", exc_info=True)
+                    for lease in leases:
+                        try:
+                            with self.env.cr.savepoint():
+                                moves = lease._generate_rent_invoices(periods)
+                            stats["invoiced"] += len(moves)
+                        except Exception:
+                            _logger.exception("Could not generate the rent invoice of lease %s", lease.name)
+                            stats["failed"] += 1
+                            failed_ids.append(lease.id)
+            self.env["ir.cron"]._commit_progress()
+            self.env.invalidate_all()
+            _logger.debug("Rent invoicing progress: %(invoiced)s invoiced, %(failed)s failed", stats)
+        duration = time.perf_counter() - started
+        stats["duration"] = duration
+        _logger.info(
+            "Generated %s rent invoices in %.2fs (%.1f invoices/s), %s leases failed",
+            stats["invoiced"],
+            duration,
+            stats["invoiced"] / duration if duration else 0.0,
+            stats["failed"],
+        )
+        return stats
+
+    @api.model
+    def cron_generate_rent_invoices(self):
+        # Wake up the sibling worker crons: they claim chunks from the same
+        # set of due leases and run in parallel with this one.
+        workers = self.env["ir.cron"].sudo().search(
+            [("model_id.model", "=", self._name), ("code", "=like", "model._cron_rent_invoice_worker(%")]
         )
-        for lease in leases:
-            lease.action_generate_invoice(lease.next_invoice_date)
+        for worker in workers:
+            worker._trigger()
+        with self.env["property.perf.run"]._track("rent_invoice") as run:
+            stats = self._run_rent_invoice_worker(partition=0)
+            run.update(processed=stats["invoiced"], failed=stats["failed"])
+        return stats
+
+    @api.model
+    def _cron_rent_invoice_worker(self, partition=None):
+        with self.env["property.perf.run"]._track("rent_invoice_worker") as run:
+            stats = self._run_rent_invoice_worker(partition=partition)
+            run.update(processed=stats["invoiced"], failed=stats["failed"])
+        return stats
+
+    @api.model
+    def _lifecycle_batch_size(self):
+        return 1000
+
+    @api.model
+    def _claim_expired_leases(self, today, limit):
+        """Lock and return up to ``limit`` ids of active leases whose end date has passed.
+
+        Leases with periods left to invoice up to their end date are left
+        to the invoicing job first.
+        """
+        self.flush_model(["state", "end_date", "next_invoice_date"])
+        self.env.cr.execute(
+            SQL(
+                """
+                SELECT id
+                  FROM %(table)s
+                 WHERE state = 'active'
+                   AND end_date < %(today)s
+                   AND (next_invoice_date IS NULL OR next_invoice_date > end_date)
+              ORDER BY id
+                 LIMIT %(limit)s
+                   FOR UPDATE SKIP LOCKED
+                """,
+                table=SQL.identifier(self._table),
+                today=today,
+                limit=limit,
+            )
+        )
+        return [row[0] for row in self.env.cr.fetchall()]
+
+    def _get_renewal_end_date(self, today):
+        """Return the first end date on or after ``today`` in steps of the renewal term."""
+        self.ensure_one()
+        terms = 1
+        # Step from the original end date so month-end dates do not drift.
+        while self.end_date + relativedelta(months=self.renewal_months * terms) < today:
+            terms += 1
+        return self.end_date + relativedelta(months=self.renewal_months * terms)
+
+    @api.model
+    def cron_lease_lifecycle(self):
+        """End the expired leases, renew the auto-renewing ones and sync the units.
+
+        Each chunk is one short transaction: leases sharing an outcome are
+        written together and every change is logged. Only active leases past
+        their end date and fully invoiced are picked up, so the job can
+        safely be rerun.
+        """
+        with self.env["property.perf.run"]._track("lease_lifecycle") as run:
+            today = fields.Date.context_today(self)
+            Log = self.env["property.lease.lifecycle.log"]
+            stats = {"ended": 0, "renewed": 0}
+            while lease_ids := self._claim_expired_leases(today, self._lifecycle_batch_size()):
+                leases = self.browse(lease_ids)
+                to_renew = leases.filtered(lambda lease: lease.auto_renew and lease.renewal_months > 0)
+                to_end = leases - to_renew
+                log_vals = [
+                    {"lease_id": lease.id, "action": "ended", "run_date": today, "end_date": lease.end_date}
+                    for lease in to_end
+                ]
+                lease_ids_by_end_date = defaultdict(list)
+                for lease in to_renew:
+                    new_end_date = lease._get_renewal_end_date(today)
+                    lease_ids_by_end_date[new_end_date].append(lease.id)
+                    log_vals.append(
+                        {
+                            "lease_id": lease.id,
+                            "action": "renewed",
+                            "run_date": today,
+                            "end_date": lease.end_date,
+                            "new_end_date": new_end_date,
+                        }
+                    )
+                to_end.write({"state": "ended"})
+                for end_date, renew_ids in lease_ids_by_end_date.items():
+                    self.browse(renew_ids).write({"end_date": end_date})
+                Log.create(log_vals)
+                stats["ended"] += len(to_end)
+                stats["renewed"] += len(to_renew)
+                self.env["ir.cron"]._commit_progress()
+                self.env.invalidate_all()
+            stats["units"] = self.env["property.unit"]._sync_occupancy(today)
+            run["processed"] = stats["ended"] + stats["renewed"] + stats["units"]
+            _logger.info(
+                "Lease lifecycle: %(ended)s leases ended, %(renewed)s renewed, %(units)s units synced", stats
+            )
+        return stats
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+import csv
+import io
+import logging
+import time
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+
+class PropertyLeaseImport(models.AbstractModel):
+    _name = "property.lease.import"
+    _description = "Bulk Lease Import"
+
+    @api.model
+    def _import_batch_size(self):
+        return 1000
+
+    @api.model
+    def import_csv(self, data, activate=True, default_rent_product_id=False):
+        """Import a CSV file whose header uses the keys of :meth:`import_rows`."""
+        if isinstance(data, bytes):
+            data = data.decode("utf-8-sig")
+        rows = list(csv.DictReader(io.StringIO(data)))
+        return self.import_rows(rows, activate=activate, default_rent_product_id=default_rent_product_id)
+
+    @api.model
+    def import_rows(self, rows, activate=True, default_rent_product_id=False):
+        """Create the units and leases described by ``rows`` in batches.
+
+        Each row is a dict with ``property_code``, ``unit_name``, optional
+        ``unit_number`` and ``unit_rent_amount``, ``tenant_id`` or
+        ``tenant_ref``, ``start_date``, optional ``end_date``,
+        ``rent_amount`` and optionally ``rent_product_code`` (defaults to
+        ``default_rent_product_id``). Units are reused when the property
+        already has one with that name.
+
+        Returns a report with the created counts and, per rejected row,
+        its 1-based index and the reason.
+        """
+        started = time.perf_counter()
+        errors = []
+        parsed = self._parse_import_rows(rows, default_rent_product_id, errors)
+
+        Unit = self.env["property.unit"]
+        Lease = self.env["property.lease"]
+        units_created = self._create_import_units(parsed, errors)
+
+        parsed = [row for row in parsed if row["unit_id"]]
+        names = self.env["ir.sequence"]._next_by_code_batch("property.lease", len(parsed))
+        for row, name in zip(parsed, names):
+            row["lease_vals"]["name"] = name or "New"
+            row["lease_vals"]["unit_id"] = row["unit_id"]
+
+        # Leases are created with the unit computes on hold; they are
+        # recomputed once, set-based, when every batch is in.
+        units = Unit.browse({row["unit_id"] for row in parsed})
+        unit_fields = [Unit._fields[name] for name in ("current_lease_id", "current_tenant_id", "tenant_commercial_partner_id")]
+        lease_ids = []
+        with self.env.protecting(unit_fields, units):
+            for start in range(0, len(parsed), self._import_batch_size()):
+                batch = parsed[start:start + self._import_batch_size()]
+                lease_ids += self._create_import_batch(Lease, batch, errors).ids
+                _logger.info("Lease import: %s/%s rows processed", start + len(batch), len(parsed))
+            leases = Lease.browse(lease_ids)
+            if activate:
+                leases.action_activate()
+        for field in unit_fields:
+            self.env.add_to_compute(field, units)
+        units.flush_recordset([field.name for field in unit_fields])
+
+        duration = time.perf_counter() - started
+        _logger.info("Lease import: %s leases created in %.2fs, %s rows rejected", len(leases), duration, len(errors))
+        return {
+            "rows": len(rows),
+            "units_created": units_created,
+            "leases_created": len(leases),
+            "leases_activated": len(leases) if activate else 0,
+            "errors": sorted(errors, key=lambda error: error["row"]),
+            "duration": duration,
+        }
+
+    @api.model
+    def _parse_import_rows(self, rows, default_rent_product_id, errors):
+        def values_of(key):
+            return {row[key] for row in rows if row.get(key)}
+
+        properties = {
+            prop.code: prop.id
+            for prop in self.env["property.property"].search_fetch(
+                [("code", "in", list(values_of("property_code")))], ["code"]
+            )
+        }
+        tenant_ids = {
+            int(tenant_id) for tenant_id in values_of("tenant_id") if str(tenant_id).isdigit()
+        }
+        Partner = self.env["res.partner"]
+        existing_tenant_ids = set(Partner.browse(tenant_ids).exists().ids)
+        tenants_by_ref = {
+            partner.ref: partner.id
+            for partner in Partner.search_fetch([("ref", "in", list(values_of("tenant_ref")))], ["ref"])
+        }
+        products = {
+            product.default_code: product.id
+            for product in self.env["product.product"].search_fetch(
+                [("default_code", "in", list(values_of("rent_product_code")))], ["default_code"]
+            )
+        }
+
+        parsed = []
+        for index, row in enumerate(rows, start=1):
+            try:
+                property_id = properties.get(row.get("property_code"))
+                if not property_id:
+                    raise ValueError("Unknown property code %r." % row.get("property_code"))
+                unit_name = (row.get("unit_name") or "").strip()
+                if not unit_name:
+                    raise ValueError("Missing unit name.")
+                if row.get("tenant_id"):
+                    tenant_id = int(row["tenant_id"])
+                    if tenant_id not in existing_tenant_ids:
+                        raise ValueError("Unknown tenant id %s." % tenant_id)
+                else:
+                    tenant_id = tenants_by_ref.get(row.get("tenant_ref"))
+                    if not tenant_id:
+                        raise ValueError("Unknown tenant reference %r." % row.get("tenant_ref"))
+                if row.get("rent_product_code"):
+                    product_id = products.get(row["rent_product_code"])
+                    if not product_id:
+                        raise ValueError("Unknown rent product %r." % row["rent_product_code"])
+                else:
+                    product_id = default_rent_product_id
+                if not product_id:
+                    raise ValueError("Missing rent product.")
+                start_date = fields.Date.to_date(row.get("start_date"))
+                if not start_date:
+                    raise ValueError("Missing start date.")
+                end_date = fields.Date.to_date(row.get("end_date") or None)
+                rent_amount = float(row.get("rent_amount") or 0.0)
+                unit_rent_amount = float(row.get("unit_rent_amount") or rent_amount)
+            except (TypeError, ValueError) as e:
+                errors.append({"row": index, "error": str(e)})
+                continue
+            parsed.append(
+                {
+                    "index": index,
+                    "property_id": property_id,
+                    "unit_name": unit_name,
+                    "unit_number": row.get("unit_number") or False,
+                    "unit_rent_amount": unit_rent_amount,
+                    "unit_id": False,
+                    "lease_vals": {
+                        "tenant_id": tenant_id,
+                        "start_date": start_date,
+                        "end_date": end_date,
+                        "rent_amount": rent_amount,
+                        "rent_product_id": product_id,
+                    },
+                }
+            )
+        return parsed
+
+    @api.model
+    def _create_import_units(self, parsed, errors):
+        Unit = self.env["property.unit"]
+        units = Unit.search_fetch(
+            [("property_id", "in", list({row["property_id"] for row in parsed}))],
+            ["property_id", "name"],
+        )
+        unit_ids = {(unit.property_id.id, unit.name): unit.id for unit in units}
+        new_units = {}
+        for row in parsed:
+            key = (row["property_id"], row["unit_name"])
+            if key not in unit_ids and key not in new_units:
+                new_units[key] = {
+                    "property_id": row["property_id"],
+                    "name": row["unit_name"],
+                    "unit_number": row["unit_number"],
+                    "rent_amount": row["unit_rent_amount"],
+                }
+        keys = list(new_units)
+        for start in range(0, len(keys), self._import_batch_size()):
+            batch_keys = keys[start:start + self._import_batch_size()]
+            try:
+                with self.env.cr.savepoint():
+                    created = Unit.create([new_units[key] for key in batch_keys])
+                unit_ids.update(zip(batch_keys, created.ids))
+            except Exception:
+                for key in batch_keys:
+                    try:
+                        with self.env.cr.savepoint():
+                            unit_ids[key] = Unit.create(new_units[key]).id
+                    except Exception as e:
+                        _logger.warning("Lease import: could not create unit %s", key[1], exc_info=True)
+                        for row in parsed:
+                            if (row["property_id"], row["unit_name"]) == key:
+                                errors.append({"row": row["index"], "error": str(e)})
+        for row in parsed:
+            row["unit_id"] = unit_ids.get((row["property_id"], row["unit_name"]), False)
+        return len([key for key in keys if key in unit_ids])
+
+    @api.model
+    def _create_import_batch(self, Lease, batch, errors):
+        try:
+            with self.env.cr.savepoint():
+                return Lease.create([row["lease_vals"] for row in batch])
+        except Exception:
+            _logger.warning("Lease import: batch failed, retrying row by row", exc_info=True)
+        lease_ids = []
+        for row in batch:
+            try:
+                with self.env.cr.savepoint():
+                    lease_ids.append(Lease.create(row["lease_vals"]).id)
+            except Exception as e:
+                errors.append({"row": row["index"], "error": str(e)})
+        return Lease.browse(lease_ids)
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from odoo import fields, models
+
+
+class PropertyLeaseLifecycleLog(models.Model):
+    _name = "property.lease.lifecycle.log"
+    _description = "Lease Lifecycle Log"
+    _order = "run_date desc, id desc"
+    _rec_name = "lease_id"
+
+    lease_id = fields.Many2one("property.lease", required=True, ondelete="cascade", index=True)
+    action = fields.Selection(
+        [("ended", "Ended"), ("renewed", "Renewed")],
+        required=True,
+    )
+    run_date = fields.Date(required=True)
+    end_date = fields.Date(string="Previous End Date")
+    new_end_date = fields.Date()
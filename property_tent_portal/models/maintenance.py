@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 from odoo import api, fields, models
 from odoo.exceptions import ValidationError
+from odoo.tools import SQL
+from odoo.tools.sql import create_index
 
 
 class PropertyMaintenanceRequest(models.Model):
@@ -10,8 +12,14 @@ class PropertyMaintenanceRequest(models.Model):
     _order = "create_date desc, id desc"
 
     name = fields.Char(default="New", copy=False, readonly=True)
-    tenant_id = fields.Many2one("res.partner", required=True)
-    unit_id = fields.Many2one("property.unit", required=True, ondelete="cascade")
+    tenant_id = fields.Many2one("res.partner", required=True, index=True)
+    tenant_commercial_partner_id = fields.Many2one(
+        related="tenant_id.commercial_partner_id",
+        string="Tenant Company",
+        store=True,
+        index=True,
+    )
+    unit_id = fields.Many2one("property.unit", required=True, ondelete="cascade", index=True)
     lease_id = fields.Many2one(
         "property.lease", compute="_compute_lease", store=True, readonly=True
     )
@@ -34,6 +42,7 @@ class PropertyMaintenanceRequest(models.Model):
     description = fields.Text(required=True)
     photo = fields.Binary()
     photo_filename = fields.Char()
+    photo_ids = fields.One2many("property.maintenance.photo", "request_id", string="Photos")
 
     state = fields.Selection(
         [("new", "New"), ("in_progress", "In Progress"), ("done", "Done")],
@@ -41,42 +50,118 @@ class PropertyMaintenanceRequest(models.Model):
         tracking=True,
     )
     assigned_to_id = fields.Many2one("res.users", tracking=True)
+    active = fields.Boolean(default=True)
 
     company_id = fields.Many2one(
         "res.company", required=True, default=lambda self: self.env.company
     )
 
+    def init(self):
+        super().init()
+        # Portal maintenance list: keyset pagination within one tenant.
+        create_index(
+            self.env.cr,
+            "property_maintenance_request_tenant_date_idx",
+            self._table,
+            ["tenant_commercial_partner_id", "request_date DESC", "id DESC"],
+            where="active",
+        )
+
+    def _get_active_lease_map(self):
+        """Map each (unit id, tenant id) pair of ``self`` to its active lease."""
+        pairs = {
+            (rec.unit_id.id, rec.tenant_id.id)
+            for rec in self
+            if rec.unit_id and rec.tenant_id
+        }
+        if not pairs:
+            return {}
+        leases = self.env["property.lease"].search_fetch(
+            [
+                ("unit_id", "in", list({unit_id for unit_id, _tenant_id in pairs})),
+                ("tenant_id", "in", list({tenant_id for _unit_id, tenant_id in pairs})),
+                ("state", "=", "active"),
+            ],
+            ["unit_id", "tenant_id"],
+        )
+        lease_map = {}
+        for lease in leases:
+            # Leases come in their default order, keep the first per pair.
+            lease_map.setdefault((lease.unit_id.id, lease.tenant_id.id), lease)
+        return lease_map
+
     @api.depends("tenant_id", "unit_id")
     def _compute_lease(self):
+        lease_map = self._get_active_lease_map()
         for rec in self:
-            lease = False
-            if rec.tenant_id and rec.unit_id:
-                lease = self.env["property.lease"].search(
-                    [
-                        ("unit_id", "=", rec.unit_id.id),
-                        ("tenant_id", "=", rec.tenant_id.id),
-                        ("state", "=", "active"),
-                    ],
-                    limit=1,
-                )
-            rec.lease_id = lease
+            rec.lease_id = lease_map.get((rec.unit_id.id, rec.tenant_id.id), False)
 
     @api.constrains("tenant_id", "unit_id")
     def _check_tenant_unit_link(self):
-        for rec in self:
-            if rec.tenant_id and rec.unit_id and not rec.lease_id:
-                if not self.env.user.has_group("base.group_user"):
-                    raise ValidationError("Selected unit is not assigned to this tenant.")
+        if self.env.user.has_group("base.group_user"):
+            return
+        # lease_id is computed from the same batched lease map, reading it
+        # here does not query the leases again.
+        if any(rec.tenant_id and rec.unit_id and not rec.lease_id for rec in self):
+            raise ValidationError("Selected unit is not assigned to this tenant.")
 
     @api.model_create_multi
     def create(self, vals_list):
-        for vals in vals_list:
-            if vals.get("name", "New") == "New":
-                vals["name"] = (
-                    self.env["ir.sequence"].sudo().next_by_code("property.maintenance")
-                    or "New"
-                )
-        return super().create(vals_list)
+        to_number = [vals for vals in vals_list if vals.get("name", "New") == "New"]
+        names = self.env["ir.sequence"].sudo()._next_by_code_batch(
+            "property.maintenance", len(to_number)
+        )
+        for vals, name in zip(to_number, names):
+            vals["name"] = name or "New"
+        requests = super().create(vals_list)
+        self.env["property.tenant.counter"]._mark_dirty(requests.tenant_id)
+        return requests
+
+    def write(self, vals):
+        if "tenant_id" in vals:
+            self.env["property.tenant.counter"]._mark_dirty(self.tenant_id)
+        res = super().write(vals)
+        if {"tenant_id", "state", "active"} & vals.keys():
+            self.env["property.tenant.counter"]._mark_dirty(self.tenant_id)
+        return res
+
+    def unlink(self):
+        self.env["property.tenant.counter"]._mark_dirty(self.tenant_id)
+        return super().unlink()
+
+    def _compact_legacy_photos(self):
+        """Move the inline ``photo`` of ``self`` to regular maintenance photos.
+
+        The field's filestore attachment is detached from the field and
+        reused as is, so no image data is copied.
+        """
+        self.flush_recordset(["photo_filename"])
+        self.env.cr.execute(
+            SQL(
+                """
+                UPDATE ir_attachment att
+                   SET res_field = NULL,
+                       name = COALESCE(req.photo_filename, att.name)
+                  FROM %(table)s req
+                 WHERE att.res_model = %(model)s
+                   AND att.res_field = 'photo'
+                   AND att.res_id = req.id
+                   AND req.id = ANY(%(ids)s)
+             RETURNING att.id, att.res_id
+                """,
+                table=SQL.identifier(self._table),
+                model=self._name,
+                ids=self.ids,
+            )
+        )
+        rows = self.env.cr.fetchall()
+        if rows:
+            self.env["ir.attachment"].invalidate_model(["res_field", "name"])
+            self.invalidate_recordset(["photo"])
+            self.env["property.maintenance.photo"].sudo().create(
+                [{"request_id": request_id, "attachment_id": attachment_id} for attachment_id, request_id in rows]
+            )
+        return len(rows)
 
     def action_in_progress(self):
         for rec in self:
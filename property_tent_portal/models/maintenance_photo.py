@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+import base64
+import hashlib
+import logging
+import os
+import tempfile
+
+from odoo import api, fields, models
+from odoo.exceptions import ValidationError
+from odoo.tools import SQL
+from odoo.tools.image import image_process
+from odoo.tools.mimetypes import guess_mimetype
+
+_logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+ALLOWED_PHOTO_MIMETYPES = {"image/jpeg", "image/png", "image/gif", "image/webp"}
+
+
+class PropertyMaintenancePhoto(models.Model):
+    _name = "property.maintenance.photo"
+    _description = "Maintenance Request Photo"
+    _order = "id"
+
+    request_id = fields.Many2one(
+        "property.maintenance.request", required=True, ondelete="cascade", index=True
+    )
+    attachment_id = fields.Many2one("ir.attachment", required=True, ondelete="cascade")
+    name = fields.Char(related="attachment_id.name")
+    thumbnail = fields.Image(max_width=256, max_height=256)
+    thumbnail_state = fields.Selection(
+        [("pending", "Pending"), ("done", "Done"), ("failed", "Failed")],
+        default="pending",
+        required=True,
+        index=True,
+    )
+
+    @api.model
+    def _max_upload_size(self):
+        return 10 * 1024 * 1024
+
+    @api.model
+    def _max_upload_count(self):
+        return 10
+
+    @api.model
+    def _max_request_size(self):
+        """Return the largest request body accepted by the photo upload route.
+
+        The route hands it to werkzeug, which rejects larger bodies from
+        their Content-Length before the form is parsed.
+        """
+        return self._max_upload_count() * self._max_upload_size() + UPLOAD_CHUNK_SIZE
+
+    @api.model
+    def _stream_upload_to_attachment(self, upload, maintenance_request):
+        """Copy ``upload`` chunk by chunk into a filestore attachment.
+
+        Size and type limits are enforced while reading, so oversized or
+        non-image uploads are rejected before they are fully read.
+        """
+        Attachment = self.env["ir.attachment"].sudo()
+        max_size = self._max_upload_size()
+        sha = hashlib.sha1()
+        size = 0
+        mimetype = None
+        with tempfile.SpooledTemporaryFile(max_size=UPLOAD_CHUNK_SIZE * 16) as buffer:
+            while chunk := upload.stream.read(UPLOAD_CHUNK_SIZE):
+                if mimetype is None:
+                    mimetype = guess_mimetype(chunk)
+                    if mimetype not in ALLOWED_PHOTO_MIMETYPES:
+                        raise ValidationError("Only JPEG, PNG, GIF and WebP photos can be uploaded.")
+                size += len(chunk)
+                if size > max_size:
+                    raise ValidationError(
+                        "Photos cannot be larger than %s MB." % (max_size // (1024 * 1024))
+                    )
+                sha.update(chunk)
+                buffer.write(chunk)
+            if not size:
+                raise ValidationError("The uploaded photo is empty.")
+            buffer.seek(0)
+            vals = {
+                "name": upload.filename,
+                "res_model": maintenance_request._name,
+                "res_id": maintenance_request.id,
+                "mimetype": mimetype,
+            }
+            if Attachment._storage() != "file":
+                vals["raw"] = buffer.read()
+                return Attachment.create(vals)
+            checksum = sha.hexdigest()
+            store_fname = "%s/%s" % (checksum[:2], checksum)
+            full_path = Attachment._full_path(store_fname)
+            if not os.path.exists(full_path):
+                dirname = os.path.dirname(full_path)
+                os.makedirs(dirname, exist_ok=True)
+                with tempfile.NamedTemporaryFile(dir=dirname, delete=False) as target:
+                    while chunk := buffer.read(UPLOAD_CHUNK_SIZE):
+                        target.write(chunk)
+                os.replace(target.name, full_path)
+                # Collected by the filestore GC if the transaction rolls back.
+                Attachment._mark_for_gc(store_fname)
+            # create() only stores the file itself from raw or datas: link the
+            # file written above through the storage columns.
+            attachment = Attachment.create(vals)
+            self.env.cr.execute(
+                SQL(
+                    "UPDATE ir_attachment SET store_fname = %s, file_size = %s, checksum = %s WHERE id = %s",
+                    store_fname,
+                    size,
+                    checksum,
+                    attachment.id,
+                )
+            )
+            attachment.invalidate_recordset(["store_fname", "file_size", "checksum"])
+            return attachment
+
+    @api.model
+    def _create_from_uploads(self, maintenance_request, uploads):
+        uploads = [upload for upload in uploads if upload and upload.filename]
+        if len(uploads) > self._max_upload_count():
+            raise ValidationError("At most %s photos can be uploaded at once." % self._max_upload_count())
+        photos = self.sudo().create(
+            [
+                {
+                    "request_id": maintenance_request.id,
+                    "attachment_id": self._stream_upload_to_attachment(upload, maintenance_request).id,
+                }
+                for upload in uploads
+            ]
+        )
+        if photos:
+            self.env.ref("property_tent_portal.ir_cron_property_maintenance_thumbnails")._trigger()
+        return photos
+
+    @api.model
+    def cron_generate_thumbnails(self, limit=200):
+        with self.env["property.perf.run"]._track("maintenance_thumbnails") as run:
+            photos = self.search([("thumbnail_state", "=", "pending")], limit=limit)
+            run["processed"] = len(photos)
+            for photo in photos:
+                try:
+                    thumbnail = image_process(photo.attachment_id.raw, size=(256, 256))
+                    photo.write({"thumbnail": base64.b64encode(thumbnail), "thumbnail_state": "done"})
+                except Exception:
+                    # Failed photos are not retried, and are served without a thumbnail.
+                    _logger.warning("Could not build the thumbnail of photo %s", photo.id, exc_info=True)
+                    photo.thumbnail_state = "failed"
+                    run["failed"] += 1
+            if len(photos) == limit:
+                self.env.ref("property_tent_portal.ir_cron_property_maintenance_thumbnails")._trigger()
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+import contextlib
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from odoo import api, fields, models
+from odoo.tools import SQL, str2bool
+
+_logger = logging.getLogger(__name__)
+
+METRICS_ENABLED_PARAM = "property_tent_portal.metrics_enabled"
+METRICS_TOKEN_PARAM = "property_tent_portal.metrics_token"
+ROUTE_FLUSH_KEY = "property_tent_portal.route_stats"
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_BUCKETS = (5, 10, 25, 50, 100, 250)
+
+# Route observations of this process, keyed by (route, metric, bucket) and
+# holding [count, total]. They are flushed to property.perf.route.stat at
+# most once per flush interval, after the request transaction is committed.
+_route_lock = threading.Lock()
+_route_observations = defaultdict(lambda: [0, 0.0])
+_route_last_flush = [time.monotonic()]
+
+
+def _bucket(value, bounds):
+    for bound in bounds:
+        if value <= bound:
+            return str(bound)
+    return "+Inf"
+
+
+class PropertyPerfRun(models.Model):
+    _name = "property.perf.run"
+    _description = "Scheduled Job Run"
+    _order = "started_at desc, id desc"
+
+    name = fields.Char(string="Job", required=True, index=True)
+    started_at = fields.Datetime(required=True)
+    duration = fields.Float(string="Duration (s)", digits=(16, 3))
+    processed = fields.Integer()
+    failed = fields.Integer()
+    query_count = fields.Integer(string="Queries")
+    state = fields.Selection(
+        [("running", "Running"), ("done", "Done"), ("error", "Error")],
+        default="running",
+        required=True,
+    )
+    error = fields.Text()
+
+    @api.model
+    def _metrics_enabled(self):
+        return str2bool(self.env["ir.config_parameter"].sudo().get_param(METRICS_ENABLED_PARAM, "False"))
+
+    @api.model
+    def _retention_days(self):
+        return 30
+
+    @api.model
+    @contextlib.contextmanager
+    def _track(self, name):
+        """Record one run of the scheduled job ``name``.
+
+        The body can set ``processed`` and ``failed`` on the yielded dict.
+        The run is stored through its own cursor when the job starts, so it
+        is visible while the job runs, then updated when it ends; it
+        survives a rollback of the job.
+        """
+        run = {"processed": 0, "failed": 0}
+        if not self._metrics_enabled():
+            yield run
+            return
+        started_at = fields.Datetime.now()
+        queries = self.env.cr.sql_log_count
+        started = time.perf_counter()
+        run_id = self._store_run({"name": name, "started_at": started_at, "state": "running"})
+        error = False
+        try:
+            yield run
+        except Exception as e:
+            error = str(e) or repr(e)
+            raise
+        finally:
+            self._store_run(
+                {
+                    "name": name,
+                    "started_at": started_at,
+                    "duration": time.perf_counter() - started,
+                    "processed": run["processed"],
+                    "failed": run["failed"],
+                    "query_count": self.env.cr.sql_log_count - queries,
+                    "state": "error" if error else "done",
+                    "error": error,
+                },
+                run_id,
+            )
+
+    @api.model
+    def _store_run(self, values, run_id=None):
+        """Create the run, or update run ``run_id``, and commit it; return its id."""
+        try:
+            with self.env.registry.cursor() as cr:
+                runs = self.env(cr=cr, su=True)[self._name].browse(run_id).exists()
+                if runs:
+                    runs.write(values)
+                else:
+                    runs = runs.create(values)
+                return runs.id
+        except Exception:
+            _logger.warning("Could not store the metrics of job %s", values["name"], exc_info=True)
+            return None
+
+    @api.autovacuum
+    def _gc_runs(self):
+        limit_date = fields.Datetime.now() - timedelta(days=self._retention_days())
+        self.search([("started_at", "<", limit_date)]).unlink()
+
+    @api.model
+    def get_exposition(self):
+        """Return the job and route metrics in the Prometheus text format.
+
+        Route observations not flushed yet by their process are left out.
+        """
+        lines = []
+        lines += self.env["property.perf.route.stat"]._get_exposition_lines()
+        self.env.cr.execute(
+            SQL(
+                """
+                SELECT DISTINCT ON (name) name, duration, processed, failed, query_count
+                  FROM %s
+                 ORDER BY name, started_at DESC, id DESC
+                """,
+                SQL.identifier(self._table),
+            )
+        )
+        last_runs = self.env.cr.fetchall()
+        for metric, index, help_text in (
+            ("property_job_last_duration_seconds", 1, "Duration of the last run"),
+            ("property_job_last_processed", 2, "Records processed by the last run"),
+            ("property_job_last_failed", 3, "Records that failed in the last run"),
+            ("property_job_last_queries", 4, "Queries issued by the last run"),
+        ):
+            lines.append("# HELP %s %s" % (metric, help_text))
+            lines.append("# TYPE %s gauge" % metric)
+            lines += ['%s{job="%s"} %s' % (metric, row[0], row[index]) for row in last_runs]
+        lines.append("# HELP property_job_runs Runs recorded over the retention window")
+        lines.append("# TYPE property_job_runs gauge")
+        for name, state, count in self._read_group([], ["name", "state"], ["__count"]):
+            lines.append('property_job_runs{job="%s",state="%s"} %s' % (name, state, count))
+        return "\n".join(lines) + "\n"
+
+
+class PropertyPerfRouteStat(models.Model):
+    _name = "property.perf.route.stat"
+    _description = "Portal Route Statistics"
+    _order = "route, metric, id"
+
+    route = fields.Char(required=True, readonly=True)
+    metric = fields.Selection(
+        [("latency", "Latency (s)"), ("queries", "Queries")],
+        required=True,
+        readonly=True,
+    )
+    bucket = fields.Char(string="Upper Bound", required=True, readonly=True)
+    count = fields.Integer(readonly=True)
+    total = fields.Float(readonly=True)
+
+    _sql_constraints = [
+        ("bucket_uniq", "unique(route, metric, bucket)", "Each route bucket can only be stored once."),
+    ]
+
+    @api.model
+    def _flush_interval(self):
+        return 60
+
+    @api.model
+    def _record(self, route, duration, queries):
+        with _route_lock:
+            latency = _route_observations[(route, "latency", _bucket(duration, LATENCY_BUCKETS))]
+            latency[0] += 1
+            latency[1] += duration
+            query = _route_observations[(route, "queries", _bucket(queries, QUERY_BUCKETS))]
+            query[0] += 1
+            query[1] += queries
+            flush_due = time.monotonic() - _route_last_flush[0] >= self._flush_interval()
+        if flush_due:
+            # Written once the request is committed, so the request never
+            # holds a second cursor.
+            postcommit = self.env.cr.postcommit
+            if ROUTE_FLUSH_KEY not in postcommit.data:
+                postcommit.data[ROUTE_FLUSH_KEY] = True
+                postcommit.add(self._flush_observations)
+
+    @api.model
+    def _flush_observations(self):
+        with _route_lock:
+            if time.monotonic() - _route_last_flush[0] < self._flush_interval():
+                return
+            _route_last_flush[0] = time.monotonic()
+            observations = dict(_route_observations)
+            _route_observations.clear()
+        if not observations:
+            return
+        try:
+            with self.env.registry.cursor() as cr:
+                now = cr.now()
+                uid = self.env.uid or None
+                cr.execute(
+                    SQL(
+                        """
+                        INSERT INTO %(table)s AS stat
+                               (route, metric, bucket, count, total, create_uid, create_date, write_uid, write_date)
+                        VALUES %(values)s
+                        ON CONFLICT (route, metric, bucket) DO UPDATE
+                           SET count = stat.count + EXCLUDED.count,
+                               total = stat.total + EXCLUDED.total,
+                               write_date = EXCLUDED.write_date
+                        """,
+                        table=SQL.identifier(self._table),
+                        values=SQL(", ").join(
+                            SQL("(%s, %s, %s, %s, %s, %s, %s, %s, %s)", *key, count, total, uid, now, uid, now)
+                            for key, (count, total) in observations.items()
+                        ),
+                    )
+                )
+        except Exception:
+            _logger.warning("Could not flush the portal route metrics", exc_info=True)
+
+    @api.model
+    def _get_exposition_lines(self):
+        stats = defaultdict(dict)
+        for stat in self.sudo().search_fetch([], ["route", "metric", "bucket", "count", "total"]):
+            stats[(stat.metric, stat.route)][stat.bucket] = (stat.count, stat.total)
+        lines = []
+        for metric, name, bounds in (
+            ("latency", "property_portal_request_duration_seconds", LATENCY_BUCKETS),
+            ("queries", "property_portal_request_queries", QUERY_BUCKETS),
+        ):
+            lines.append("# TYPE %s histogram" % name)
+            for (stat_metric, route), buckets in sorted(stats.items()):
+                if stat_metric != metric:
+                    continue
+                cumulative = 0
+                for bound in [str(bound) for bound in bounds] + ["+Inf"]:
+                    cumulative += buckets.get(bound, (0, 0.0))[0]
+                    lines.append('%s_bucket{route="%s",le="%s"} %s' % (name, route, bound, cumulative))
+                lines.append('%s_sum{route="%s"} %s' % (name, route, sum(total for __, total in buckets.values())))
+                lines.append('%s_count{route="%s"} %s' % (name, route, cumulative))
+        return lines
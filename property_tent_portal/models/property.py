@@ -26,11 +26,10 @@ class PropertyProperty(models.Model):
 
     @api.model_create_multi
     def create(self, vals_list):
-        for vals in vals_list:
-            if vals.get("code", "New") == "New":
-                vals["code"] = (
-                    self.env["ir.sequence"].next_by_code("property.property") or "New"
-                )
+        to_number = [vals for vals in vals_list if vals.get("code", "New") == "New"]
+        codes = self.env["ir.sequence"]._next_by_code_batch("property.property", len(to_number))
+        for vals, code in zip(to_number, codes):
+            vals["code"] = code or "New"
         return super().create(vals_list)
 
     def name_get(self):
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+from odoo import api, fields, models
+from odoo.tools import SQL
+
+
+class PropertyRentRollReport(models.Model):
+    _name = "property.rent.roll.report"
+    _description = "Rent Roll and Occupancy Report"
+    _auto = False
+    _order = "month desc, property_id"
+
+    property_id = fields.Many2one("property.property", readonly=True)
+    company_id = fields.Many2one("res.company", readonly=True)
+    currency_id = fields.Many2one("res.currency", readonly=True)
+    month = fields.Date(readonly=True)
+    unit_count = fields.Integer(readonly=True)
+    occupied_unit_count = fields.Integer(string="Occupied Units", readonly=True)
+    occupancy_rate = fields.Float(string="Occupancy (%)", aggregator="avg", readonly=True)
+    rent_roll = fields.Monetary(readonly=True)
+    billed_amount = fields.Monetary(string="Billed", readonly=True)
+    collected_amount = fields.Monetary(string="Collected", readonly=True)
+    outstanding_amount = fields.Monetary(string="Outstanding", readonly=True)
+    maintenance_count = fields.Integer(string="Maintenance Requests", readonly=True)
+    maintenance_open_count = fields.Integer(string="Open Maintenance Requests", readonly=True)
+
+    def _query(self):
+        # The current month uses the live unit occupancy (current_lease_id /
+        # status), past months are rebuilt from the lease periods. A unit
+        # counts from its creation or its first lease, whichever is earlier,
+        # so imported units with older leases count in the months they were let.
+        return SQL(
+            """
+            WITH months AS (
+                SELECT prop.id AS property_id,
+                       prop.company_id,
+                       month::date AS month
+                  FROM property_property prop
+            CROSS JOIN generate_series(
+                           date_trunc('month', COALESCE((SELECT min(start_date) FROM property_lease), now())),
+                           date_trunc('month', now()),
+                           interval '1 month'
+                       ) AS month
+            ), unit_since AS (
+                SELECT unit.property_id,
+                       LEAST(unit.create_date::date, min(lease.start_date)) AS since
+                  FROM property_unit unit
+             LEFT JOIN property_lease lease ON lease.unit_id = unit.id
+              GROUP BY unit.id
+            ), units AS (
+                SELECT months.property_id,
+                       months.month,
+                       count(*) AS unit_count
+                  FROM months
+                  JOIN unit_since
+                    ON unit_since.property_id = months.property_id
+                   AND unit_since.since < months.month + interval '1 month'
+              GROUP BY months.property_id, months.month
+            ), occupied_now AS (
+                SELECT property_id,
+                       count(*) AS unit_count
+                  FROM property_unit
+                 WHERE current_lease_id IS NOT NULL OR status = 'occupied'
+              GROUP BY property_id
+            ), leased AS (
+                SELECT months.property_id,
+                       months.month,
+                       count(DISTINCT lease.unit_id) AS occupied_unit_count,
+                       sum(lease.rent_amount) AS rent_roll
+                  FROM months
+                  JOIN property_lease lease
+                    ON lease.property_id = months.property_id
+                   AND lease.start_date < months.month + interval '1 month'
+                   AND (
+                           (lease.state = 'active' AND (lease.end_date IS NULL OR lease.end_date >= months.month))
+                           OR (lease.state = 'ended' AND lease.end_date >= months.month)
+                       )
+              GROUP BY months.property_id, months.month
+            ), billing AS (
+                SELECT lease.property_id,
+                       date_trunc('month', move.invoice_date)::date AS month,
+                       sum(move.amount_total_signed) AS billed_amount,
+                       sum(move.amount_residual_signed) AS outstanding_amount
+                  FROM account_move move
+                  JOIN property_lease lease ON lease.id = move.property_lease_id
+                 WHERE move.state = 'posted'
+                   AND move.move_type IN ('out_invoice', 'out_refund')
+              GROUP BY lease.property_id, date_trunc('month', move.invoice_date)
+            ), maintenance AS (
+                SELECT property_id,
+                       date_trunc('month', request_date)::date AS month,
+                       count(*) AS maintenance_count,
+                       count(*) FILTER (WHERE state != 'done') AS maintenance_open_count
+                  FROM property_maintenance_request
+              GROUP BY property_id, date_trunc('month', request_date)
+            ), roll AS (
+                SELECT months.property_id,
+                       months.company_id,
+                       months.month,
+                       COALESCE(units.unit_count, 0) AS unit_count,
+                       CASE
+                           WHEN months.month = date_trunc('month', now())::date
+                           THEN COALESCE(occupied_now.unit_count, 0)
+                           ELSE COALESCE(leased.occupied_unit_count, 0)
+                       END AS occupied_unit_count,
+                       COALESCE(leased.rent_roll, 0) AS rent_roll,
+                       COALESCE(billing.billed_amount, 0) AS billed_amount,
+                       COALESCE(billing.outstanding_amount, 0) AS outstanding_amount,
+                       COALESCE(maintenance.maintenance_count, 0) AS maintenance_count,
+                       COALESCE(maintenance.maintenance_open_count, 0) AS maintenance_open_count
+                  FROM months
+             LEFT JOIN units ON units.property_id = months.property_id AND units.month = months.month
+             LEFT JOIN occupied_now ON occupied_now.property_id = months.property_id
+             LEFT JOIN leased ON leased.property_id = months.property_id AND leased.month = months.month
+             LEFT JOIN billing ON billing.property_id = months.property_id AND billing.month = months.month
+             LEFT JOIN maintenance ON maintenance.property_id = months.property_id AND maintenance.month = months.month
+            )
+            SELECT row_number() OVER (ORDER BY roll.property_id, roll.month) AS id,
+                   roll.property_id,
+                   roll.company_id,
+                   company.currency_id,
+                   roll.month,
+                   roll.unit_count,
+                   roll.occupied_unit_count,
+                   CASE
+                       WHEN roll.unit_count > 0
+                       THEN 100.0 * roll.occupied_unit_count / roll.unit_count
+                       ELSE 0
+                   END AS occupancy_rate,
+                   roll.rent_roll,
+                   roll.billed_amount,
+                   roll.billed_amount - roll.outstanding_amount AS collected_amount,
+                   roll.outstanding_amount,
+                   roll.maintenance_count,
+                   roll.maintenance_open_count
+              FROM roll
+              JOIN res_company company ON company.id = roll.company_id
+            """
+        )
+
+    def init(self):
+        table = SQL.identifier(self._table)
+        self.env.cr.execute(SQL("DROP MATERIALIZED VIEW IF EXISTS %s", table))
+        self.env.cr.execute(SQL("CREATE MATERIALIZED VIEW %s AS (%s)", table, self._query()))
+        # REFRESH ... CONCURRENTLY needs a unique index on the view.
+        self.env.cr.execute(
+            SQL(
+                "CREATE UNIQUE INDEX %s ON %s (property_id, month)",
+                SQL.identifier(f"{self._table}_property_month_uniq"),
+                table,
+            )
+        )
+        self.env.cr.execute(
+            SQL("CREATE UNIQUE INDEX %s ON %s (id)", SQL.identifier(f"{self._table}_id_uniq"), table)
+        )
+
+    @api.model
+    def cron_refresh(self):
+        with self.env["property.perf.run"]._track("rent_roll_refresh"):
+            self.env.flush_all()
+            self.env.cr.execute(
+                SQL("REFRESH MATERIALIZED VIEW CONCURRENTLY %s", SQL.identifier(self._table))
+            )
+            self.invalidate_model()
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+import logging
+import time
+from datetime import timedelta
+
+from odoo import api, fields, models
+from odoo.tools import SQL
+
+from .account_move import RENT_PAID_STATES
+
+_logger = logging.getLogger(__name__)
+
+
+class PropertyRentSms(models.Model):
+    _name = "property.rent.sms"
+    _description = "Rent SMS Queue"
+    _order = "id"
+
+    move_id = fields.Many2one("account.move", required=True, ondelete="cascade", index=True)
+    partner_id = fields.Many2one("res.partner")
+    kind = fields.Selection(
+        [("due", "Due Reminder"), ("overdue", "Overdue Alert"), ("paid", "Payment Confirmation")],
+        required=True,
+    )
+    state = fields.Selection(
+        [("pending", "Pending"), ("sent", "Sent"), ("failed", "Failed")],
+        default="pending",
+        required=True,
+        index=True,
+    )
+    attempt_count = fields.Integer(default=0)
+    next_attempt_at = fields.Datetime(default=fields.Datetime.now, required=True)
+    sent_at = fields.Datetime()
+    last_error = fields.Text()
+
+    _sql_constraints = [
+        ("move_kind_uniq", "unique(move_id, kind)", "A rent SMS of each type can only be queued once per invoice."),
+    ]
+
+    @api.model
+    def _dispatch_batch_size(self):
+        return 100
+
+    @api.model
+    def _dispatch_rate_limit(self):
+        """Maximum number of messages sent per second."""
+        return 10
+
+    @api.model
+    def _dispatch_max_attempts(self):
+        return 5
+
+    @api.model
+    def _dispatch_retry_delay(self, attempt_count):
+        return timedelta(minutes=5 * 2 ** (attempt_count - 1))
+
+    @api.model
+    def _insert_pending(self, query):
+        """Queue the ``(move_id, partner_id, kind)`` rows selected by ``query``.
+
+        The queue doubles as the send ledger: rows whose invoice already has
+        a message of that type are skipped by the unique constraint, so
+        concurrent or retried runs can never queue the same message twice.
+        """
+        self.env.flush_all()
+        now = self.env.cr.now()
+        self.env.cr.execute(
+            SQL(
+                """
+                INSERT INTO %(table)s (
+                    move_id, partner_id, kind, state, attempt_count, next_attempt_at,
+                    create_uid, create_date, write_uid, write_date
+                )
+                SELECT candidate.move_id, candidate.partner_id, candidate.kind, 'pending', 0, %(now)s,
+                       %(uid)s, %(now)s, %(uid)s, %(now)s
+                  FROM (%(query)s) AS candidate(move_id, partner_id, kind)
+                    ON CONFLICT (move_id, kind) DO NOTHING
+             RETURNING id
+                """,
+                table=SQL.identifier(self._table),
+                query=query,
+                now=now,
+                uid=self.env.uid,
+            )
+        )
+        records = self.browse([row[0] for row in self.env.cr.fetchall()])
+        if records:
+            self.env["account.move"].invalidate_model(["rent_sms_queue_ids"])
+            self.env.ref("property_tent_portal.ir_cron_property_rent_sms_dispatch")._trigger()
+        return records
+
+    @api.model
+    def _enqueue(self, moves, kind):
+        if not moves:
+            return self.browse()
+        return self._insert_pending(
+            SQL(
+                "SELECT id, partner_id, %s::varchar FROM account_move WHERE id = ANY(%s)",
+                kind,
+                moves.ids,
+            )
+        )
+
+    @api.model
+    def _enqueue_reminders(self, due_date, today):
+        """Queue the due reminders and overdue alerts of all open rent invoices.
+
+        Both kinds are selected and classified in a single pass over the
+        open rent invoice index.
+        """
+        return self._insert_pending(self._get_reminder_candidates_query(due_date, today))
+
+    @api.model
+    def _get_reminder_candidates_query(self, due_date, today):
+        return SQL(
+            """
+            SELECT move.id,
+                   move.partner_id,
+                   CASE WHEN move.invoice_date_due = %(due_date)s THEN 'due' ELSE 'overdue' END::varchar
+              FROM account_move move
+             WHERE move.move_type = 'out_invoice'
+               AND move.state = 'posted'
+               AND move.payment_state NOT IN %(paid_states)s
+               AND move.property_lease_id IS NOT NULL
+               AND (move.invoice_date_due = %(due_date)s OR move.invoice_date_due < %(today)s)
+            """,
+            paid_states=RENT_PAID_STATES,
+            due_date=due_date,
+            today=today,
+        )
+
+    def _get_body(self):
+        self.ensure_one()
+        builders = {
+            "due": self.move_id._build_due_sms,
+            "overdue": self.move_id._build_overdue_sms,
+            "paid": self.move_id._build_paid_sms,
+        }
+        return builders[self.kind]()
+
+    def _gateway_send(self):
+        """Hand one message over to the SMS gateway."""
+        self.ensure_one()
+        self.move_id._send_rent_sms(self._get_body())
+
+    def _send(self):
+        now = fields.Datetime.now()
+        sent_ids = []
+        for sms in self:
+            try:
+                with self.env.cr.savepoint():
+                    sms._gateway_send()
+                sent_ids.append(sms.id)
+            except Exception as e:
+                _logger.warning("Rent SMS %s could not be sent: %s", sms.id, e)
+                attempt_count = sms.attempt_count + 1
+                vals = {"attempt_count": attempt_count, "last_error": str(e)}
+                if attempt_count >= self._dispatch_max_attempts():
+                    vals["state"] = "failed"
+                else:
+                    vals["next_attempt_at"] = now + self._dispatch_retry_delay(attempt_count)
+                sms.write(vals)
+
+        sent = self.browse(sent_ids)
+        sent.write({"state": "sent", "sent_at": now})
+        return sent
+
+    @api.model
+    def cron_dispatch_rent_sms(self):
+        with self.env["property.perf.run"]._track("rent_sms_dispatch") as run:
+            batch_size = self._dispatch_batch_size()
+            rate_limit = self._dispatch_rate_limit()
+            sent_count = 0
+            started = time.monotonic()
+            while True:
+                batch = self.search(
+                    [("state", "=", "pending"), ("next_attempt_at", "<=", fields.Datetime.now())],
+                    limit=batch_size,
+                )
+                if not batch:
+                    break
+                batch_started = time.monotonic()
+                sent = batch._send()
+                sent_count += len(sent)
+                run["failed"] += len(batch) - len(sent)
+                self.env["ir.cron"]._commit_progress()
+                # Throttle so the gateway never sees more than the rate limit,
+                # whether or not the batches are committed one by one.
+                elapsed = time.monotonic() - batch_started
+                min_batch_duration = len(batch) / rate_limit
+                if elapsed < min_batch_duration:
+                    time.sleep(min_batch_duration - elapsed)
+                self.env.invalidate_all()
+            run["processed"] = sent_count
+            duration = time.monotonic() - started
+            _logger.info(
+                "Dispatched %s rent SMS in %.2fs (%.1f SMS/s)",
+                sent_count,
+                duration,
+                sent_count / duration if duration else 0.0,
+            )
+
+    @api.model
+    def get_queue_metrics(self):
+        """Return the queue depth per state and the send rate of the last hour."""
+        counts = dict(self._read_group([], ["state"], ["__count"]))
+        sent_last_hour = self.search_count(
+            [("state", "=", "sent"), ("sent_at", ">=", fields.Datetime.now() - timedelta(hours=1))]
+        )
+        return {
+            "pending": counts.get("pending", 0),
+            "sent": counts.get("sent", 0),
+            "failed": counts.get("failed", 0),
+            "sent_last_hour": sent_last_hour,
+            "send_rate_per_minute": sent_last_hour / 60.0,
+        }
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from odoo import models
+
+
+class ResPartner(models.Model):
+    _inherit = "res.partner"
+
+    def write(self, vals):
+        if not {"parent_id", "is_company"} & vals.keys():
+            return super().write(vals)
+        # Moving a contact changes the commercial partner its leases count
+        # for: refresh the counters, and cached units, of both tenants.
+        Counter = self.env["property.tenant.counter"]
+        Lease = self.env["property.lease"].sudo().with_context(active_test=False)
+        tenants = Lease.search([("tenant_id", "child_of", self.ids)]).tenant_id
+        Counter._mark_dirty(tenants)
+        res = super().write(vals)
+        Counter._mark_dirty(tenants)
+        return res
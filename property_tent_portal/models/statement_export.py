@@ -0,0 +1,373 @@
+# -*- coding: utf-8 -*-
+import csv
+import io
+import logging
+import tempfile
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date
+
+import xlsxwriter
+from werkzeug.urls import url_encode
+
+from odoo import api, fields, models
+from odoo.tools import SQL
+
+from .account_move import RENT_PAID_STATES
+
+_logger = logging.getLogger(__name__)
+
+EXPORT_STREAM_BLOCK_SIZE = 64 * 1024
+XLSX_MAX_ROWS = 1048576
+
+STATEMENT_COLUMNS = [
+    "Tenant",
+    "Lease",
+    "Property",
+    "Unit",
+    "Document",
+    "Type",
+    "Date",
+    "Due Date",
+    "Amount",
+    "Paid",
+    "Outstanding",
+    "Balance",
+]
+RENT_ROLL_COLUMNS = [
+    "Property",
+    "Unit",
+    "Status",
+    "Tenant",
+    "Lease",
+    "Start Date",
+    "End Date",
+    "Rent",
+    "Outstanding",
+]
+
+
+class PropertyStatementExport(models.TransientModel):
+    _name = "property.statement.export"
+    _description = "Tenant Statement and Rent Roll Export"
+
+    export_type = fields.Selection(
+        [("statement", "Tenant Statements"), ("rent_roll", "Rent Roll")],
+        required=True,
+        default="statement",
+    )
+    file_format = fields.Selection(
+        [("csv", "CSV"), ("xlsx", "Excel"), ("pdf", "PDF")],
+        required=True,
+        default="csv",
+    )
+    date_from = fields.Date(default=lambda self: fields.Date.context_today(self).replace(day=1))
+    date_to = fields.Date(default=fields.Date.context_today)
+    property_ids = fields.Many2many("property.property", string="Properties")
+    tenant_ids = fields.Many2many("res.partner", string="Tenants")
+
+    def action_export(self):
+        self.ensure_one()
+        params = {"fmt": self.file_format}
+        if self.export_type == "statement":
+            params.update(
+                date_from=fields.Date.to_string(self.date_from or date.min),
+                date_to=fields.Date.to_string(self.date_to or fields.Date.context_today(self)),
+            )
+            if self.tenant_ids:
+                params["tenant_ids"] = ",".join(str(tenant_id) for tenant_id in self.tenant_ids.ids)
+        if self.property_ids:
+            params["property_ids"] = ",".join(str(property_id) for property_id in self.property_ids.ids)
+        return {
+            "type": "ir.actions.act_url",
+            "url": "/property_tent_portal/export/%s?%s" % (self.export_type, url_encode(params)),
+            "target": "self",
+        }
+
+    @api.model
+    def _export_chunk_size(self):
+        return 1000
+
+    @api.model
+    def _pdf_workers(self):
+        return 4
+
+    @api.model
+    def _get_export_filename(self, export_type, file_format):
+        today = fields.Date.to_string(fields.Date.context_today(self))
+        extension = "zip" if file_format == "pdf" else file_format
+        return "%s_%s.%s" % ("tenant_statements" if export_type == "statement" else "rent_roll", today, extension)
+
+    @api.model
+    def _check_export_access(self):
+        for model in ("property.lease", "property.unit", "account.move"):
+            self.env[model].check_access("read")
+
+    @api.model
+    def _get_move_query(self, domain):
+        """Return the ids of the rent invoices of ``domain`` the user can read, as a subquery."""
+        return self.env["account.move"]._search(domain + [("property_lease_id", "!=", False)]).select("id")
+
+    @api.model
+    def _iter_statement_chunks(self, date_from, date_to, property_ids=None, tenant_ids=None):
+        """Yield the statement lines of the tenants in scope, a chunk of tenants at a time.
+
+        Tenants are walked by keyset on their commercial partner, so each
+        chunk is one bounded query and a tenant never spans two chunks.
+        Leases and invoices are selected under the user's access rights and
+        record rules.
+        """
+        self._check_export_access()
+        domain = []
+        if property_ids:
+            domain.append(("property_id", "in", property_ids))
+        if tenant_ids:
+            tenant_ids = self.env["res.partner"].browse(tenant_ids).commercial_partner_id.ids
+            domain.append(("tenant_commercial_partner_id", "in", tenant_ids))
+        lease_ids = self.env["property.lease"].with_context(active_test=False)._search(domain).select("id")
+        move_ids = self._get_move_query(
+            [
+                ("state", "=", "posted"),
+                ("move_type", "in", ("out_invoice", "out_refund")),
+                ("invoice_date", ">=", date_from),
+                ("invoice_date", "<=", date_to),
+            ]
+        )
+        self.env.flush_all()
+        last_tenant_id = 0
+        while True:
+            self.env.cr.execute(
+                SQL(
+                    """
+                    SELECT DISTINCT tenant_commercial_partner_id
+                      FROM property_lease
+                     WHERE id IN (%(lease_ids)s)
+                       AND tenant_commercial_partner_id > %(last_tenant_id)s
+                  ORDER BY tenant_commercial_partner_id
+                     LIMIT %(limit)s
+                    """,
+                    lease_ids=lease_ids,
+                    last_tenant_id=last_tenant_id,
+                    limit=self._export_chunk_size(),
+                )
+            )
+            chunk_tenant_ids = [row[0] for row in self.env.cr.fetchall()]
+            if not chunk_tenant_ids:
+                return
+            last_tenant_id = chunk_tenant_ids[-1]
+            self.env.cr.execute(
+                SQL(
+                    """
+                    SELECT tenant.name,
+                           lease.name,
+                           prop.name,
+                           unit.name,
+                           move.name,
+                           CASE WHEN move.move_type = 'out_refund' THEN 'Credit Note' ELSE 'Invoice' END,
+                           move.invoice_date,
+                           move.invoice_date_due,
+                           move.amount_total_signed,
+                           move.amount_total_signed - move.amount_residual_signed,
+                           move.amount_residual_signed,
+                           sum(move.amount_residual_signed) OVER (
+                               PARTITION BY lease.tenant_commercial_partner_id
+                               ORDER BY move.invoice_date, move.id
+                           ),
+                           lease.tenant_commercial_partner_id
+                      FROM account_move move
+                      JOIN property_lease lease ON lease.id = move.property_lease_id
+                      JOIN res_partner tenant ON tenant.id = lease.tenant_commercial_partner_id
+                      JOIN property_unit unit ON unit.id = lease.unit_id
+                      JOIN property_property prop ON prop.id = lease.property_id
+                     WHERE lease.tenant_commercial_partner_id = ANY(%(tenant_ids)s)
+                       AND lease.id IN (%(lease_ids)s)
+                       AND move.id IN (%(move_ids)s)
+                  ORDER BY lease.tenant_commercial_partner_id, move.invoice_date, move.id
+                    """,
+                    tenant_ids=chunk_tenant_ids,
+                    lease_ids=lease_ids,
+                    move_ids=move_ids,
+                )
+            )
+            yield self.env.cr.fetchall()
+
+    @api.model
+    def _iter_rent_roll_chunks(self, property_ids=None):
+        """Yield the rent roll lines, one unit per line, ordered by property then unit.
+
+        Units are walked by keyset on (property, unit), a chunk at a time;
+        units and invoices are selected under the user's access rights and
+        record rules.
+        """
+        self._check_export_access()
+        domain = [("property_id", "in", property_ids)] if property_ids else []
+        unit_ids = self.env["property.unit"]._search(domain).select("id")
+        move_ids = self._get_move_query(
+            [("state", "=", "posted"), ("move_type", "=", "out_invoice"), ("payment_state", "not in", RENT_PAID_STATES)]
+        )
+        self.env.flush_all()
+        last_key = (0, 0)
+        while True:
+            self.env.cr.execute(
+                SQL(
+                    """
+                    SELECT prop.name,
+                           unit.name,
+                           CASE WHEN unit.status = 'occupied' THEN 'Occupied' ELSE 'Vacant' END,
+                           tenant.name,
+                           lease.name,
+                           lease.start_date,
+                           lease.end_date,
+                           lease.rent_amount,
+                           COALESCE(open_moves.amount_residual, 0),
+                           unit.property_id,
+                           unit.id
+                      FROM property_unit unit
+                      JOIN property_property prop ON prop.id = unit.property_id
+                 LEFT JOIN property_lease lease ON lease.id = unit.current_lease_id
+                 LEFT JOIN res_partner tenant ON tenant.id = unit.current_tenant_id
+                 LEFT JOIN LATERAL (
+                               SELECT sum(move.amount_residual_signed) AS amount_residual
+                                 FROM account_move move
+                                WHERE move.property_lease_id = lease.id
+                                  AND move.id IN (%(move_ids)s)
+                           ) AS open_moves ON TRUE
+                     WHERE unit.id IN (%(unit_ids)s)
+                       AND (unit.property_id, unit.id) > (%(last_property_id)s, %(last_unit_id)s)
+                  ORDER BY unit.property_id, unit.id
+                     LIMIT %(limit)s
+                    """,
+                    unit_ids=unit_ids,
+                    move_ids=move_ids,
+                    last_property_id=last_key[0],
+                    last_unit_id=last_key[1],
+                    limit=self._export_chunk_size(),
+                )
+            )
+            rows = self.env.cr.fetchall()
+            if not rows:
+                return
+            last_key = rows[-1][-2:]
+            yield [row[:-1] for row in rows]
+
+    @api.model
+    def _iter_export_chunks(self, export_type, params):
+        if export_type == "statement":
+            return STATEMENT_COLUMNS, self._iter_statement_chunks(
+                params["date_from"],
+                params["date_to"],
+                property_ids=params.get("property_ids"),
+                tenant_ids=params.get("tenant_ids"),
+            )
+        return RENT_ROLL_COLUMNS, self._iter_rent_roll_chunks(property_ids=params.get("property_ids"))
+
+    @api.model
+    def _stream_export(self, export_type, file_format, params):
+        """Yield the export as blocks of bytes.
+
+        Every row of a chunk ends with the id of the tenant (statements) or
+        property (rent roll) it belongs to; the writers drop it and the PDF
+        writer groups on it.
+        """
+        columns, chunks = self._iter_export_chunks(export_type, params)
+        if file_format == "csv":
+            return self._stream_csv(columns, chunks)
+        if file_format == "xlsx":
+            return self._stream_xlsx(columns, chunks)
+        return self._stream_pdf(export_type, chunks, params)
+
+    @api.model
+    def _stream_csv(self, columns, chunks):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for rows in chunks:
+            writer.writerows(row[:-1] for row in rows)
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+
+    @api.model
+    def _stream_xlsx(self, columns, chunks):
+        # constant_memory flushes every row to disk as soon as the next one
+        # starts, so the workbook never holds more than one row in memory.
+        with tempfile.TemporaryFile() as output:
+            workbook = xlsxwriter.Workbook(output, {"constant_memory": True})
+            header_format = workbook.add_format({"bold": True})
+            date_format = workbook.add_format({"num_format": "yyyy-mm-dd"})
+            sheet, row_index = None, XLSX_MAX_ROWS
+            for rows in chunks:
+                for row in rows:
+                    if row_index == XLSX_MAX_ROWS:
+                        sheet = workbook.add_worksheet()
+                        sheet.write_row(0, 0, columns, header_format)
+                        row_index = 1
+                    for col_index, value in enumerate(row[:-1]):
+                        if isinstance(value, date):
+                            sheet.write_datetime(row_index, col_index, value, date_format)
+                        elif value is not None:
+                            sheet.write(row_index, col_index, value)
+                    row_index += 1
+            if sheet is None:
+                workbook.add_worksheet().write_row(0, 0, columns, header_format)
+            workbook.close()
+            output.seek(0)
+            while block := output.read(EXPORT_STREAM_BLOCK_SIZE):
+                yield block
+
+    @api.model
+    def _iter_groups(self, chunks):
+        """Yield ``(key, rows)`` for each run of rows sharing their last column, across chunks."""
+        key, group = None, []
+        for rows in chunks:
+            for row in rows:
+                if group and row[-1] != key:
+                    yield key, group
+                    group = []
+                key = row[-1]
+                group.append(row[:-1])
+        if group:
+            yield key, group
+
+    @api.model
+    def _render_pdf_group(self, export_type, key, rows, params):
+        """Render the PDF of one tenant or property through a cursor of its own."""
+        if export_type == "statement":
+            report_ref = "property_tent_portal.action_report_tenant_statement"
+            data = {"lines": rows, "date_from": params["date_from"], "date_to": params["date_to"]}
+        else:
+            report_ref = "property_tent_portal.action_report_rent_roll"
+            data = {"lines": rows}
+        with self.env.registry.cursor() as cr:
+            env = self.env(cr=cr)
+            pdf, __ = env["ir.actions.report"]._render_qweb_pdf(report_ref, [key], data=data)
+            record = env["res.partner" if export_type == "statement" else "property.property"].browse(key)
+            return "%s_%s.pdf" % (key, "".join(c if c.isalnum() else "_" for c in record.display_name or "")), pdf
+
+    @api.model
+    def _stream_pdf(self, export_type, chunks, params):
+        """Yield a zip with one PDF per tenant or property.
+
+        The PDFs are rendered by a pool of threads, each with its own
+        cursor; the renders themselves run in wkhtmltopdf processes. At most
+        two renders per worker are in flight, so memory stays bounded.
+        """
+        workers = self._pdf_workers()
+        with tempfile.TemporaryFile() as output:
+            with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive, ThreadPoolExecutor(
+                max_workers=workers
+            ) as executor:
+                pending = set()
+                for key, rows in self._iter_groups(chunks):
+                    if len(pending) >= workers * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            archive.writestr(*future.result())
+                    pending.add(executor.submit(self._render_pdf_group, export_type, key, rows, params))
+                for future in pending:
+                    archive.writestr(*future.result())
+            output.seek(0)
+            while block := output.read(EXPORT_STREAM_BLOCK_SIZE):
+                yield block
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+from odoo import api, fields, models
+from odoo.tools import SQL
+
+DIRTY_PARTNERS_KEY = "property_tent_portal.tenant_counters"
+
+
+class PropertyTenantCounter(models.Model):
+    _name = "property.tenant.counter"
+    _description = "Tenant Portal Counters"
+    _rec_name = "partner_id"
+
+    partner_id = fields.Many2one("res.partner", required=True, ondelete="cascade")
+    lease_count = fields.Integer()
+    maintenance_count = fields.Integer()
+    maintenance_open_count = fields.Integer()
+    unpaid_invoice_count = fields.Integer()
+
+    _sql_constraints = [
+        ("partner_uniq", "unique(partner_id)", "Each tenant can only have one counter row."),
+    ]
+
+    @api.model
+    def _get_counters(self, partner):
+        return self.sudo().search([("partner_id", "=", partner.commercial_partner_id.id)], limit=1)
+
+    @api.model
+    def _mark_dirty(self, partners):
+        """Refresh the counters of the tenants ``partners`` right before commit."""
+        partner_ids = partners.commercial_partner_id.ids
+        if not partner_ids:
+            return
+        precommit = self.env.cr.precommit
+        if DIRTY_PARTNERS_KEY not in precommit.data:
+            precommit.data[DIRTY_PARTNERS_KEY] = set()
+            precommit.add(self._refresh_dirty)
+        precommit.data[DIRTY_PARTNERS_KEY].update(partner_ids)
+
+    @api.model
+    def _get_version(self, commercial_partner_id):
+        """Return a key that changes each time the tenant's counters are refreshed.
+
+        Return None while the current transaction has counters waiting for
+        their refresh: what it reads is not the committed state yet.
+        """
+        if DIRTY_PARTNERS_KEY in self.env.cr.precommit.data:
+            return None
+        counter = self.sudo().search_fetch([("partner_id", "=", commercial_partner_id)], ["write_date"], limit=1)
+        return (counter.id, counter.write_date)
+
+    def _refresh_dirty(self):
+        partner_ids = self.env.cr.precommit.data.pop(DIRTY_PARTNERS_KEY, set())
+        if partner_ids:
+            self.sudo()._refresh(list(partner_ids))
+
+    @api.model
+    def _refresh(self, partner_ids=None):
+        """Recompute the counters of the given commercial partners, or of all tenants."""
+        self.env.flush_all()
+        if partner_ids is None:
+            self.env.cr.execute(SQL("DELETE FROM %s", SQL.identifier(self._table)))
+            partner_filter = SQL("TRUE")
+            extra_partners = SQL("")
+        else:
+            partner_filter = SQL("tenant.commercial_partner_id = ANY(%s)", partner_ids)
+            # Tenants left without any record still need their row reset.
+            extra_partners = SQL("UNION SELECT unnest(%s::int[])", partner_ids)
+        now = self.env.cr.now()
+        self.env.cr.execute(
+            SQL(
+                """
+                WITH leases AS (
+                    SELECT tenant.commercial_partner_id AS partner_id,
+                           count(*) AS lease_count
+                      FROM property_lease lease
+                      JOIN res_partner tenant ON tenant.id = lease.tenant_id
+                     WHERE lease.active
+                       AND %(partner_filter)s
+                  GROUP BY 1
+                ), requests AS (
+                    SELECT tenant.commercial_partner_id AS partner_id,
+                           count(*) AS maintenance_count,
+                           count(*) FILTER (WHERE req.state != 'done') AS maintenance_open_count
+                      FROM property_maintenance_request req
+                      JOIN res_partner tenant ON tenant.id = req.tenant_id
+                     WHERE req.active
+                       AND %(partner_filter)s
+                  GROUP BY 1
+                ), invoices AS (
+                    SELECT tenant.commercial_partner_id AS partner_id,
+                           count(*) AS unpaid_invoice_count
+                      FROM account_move move
+                      JOIN res_partner tenant ON tenant.id = move.partner_id
+                     WHERE move.move_type = 'out_invoice'
+                       AND move.state = 'posted'
+                       AND move.payment_state IN ('not_paid', 'partial')
+                       AND move.property_lease_id IS NOT NULL
+                       AND %(partner_filter)s
+                  GROUP BY 1
+                ), partners AS (
+                    SELECT partner_id FROM leases
+                     UNION SELECT partner_id FROM requests
+                     UNION SELECT partner_id FROM invoices
+                    %(extra_partners)s
+                )
+                INSERT INTO %(table)s (
+                    partner_id, lease_count, maintenance_count, maintenance_open_count,
+                    unpaid_invoice_count, create_uid, create_date, write_uid, write_date
+                )
+                SELECT partners.partner_id,
+                       COALESCE(leases.lease_count, 0),
+                       COALESCE(requests.maintenance_count, 0),
+                       COALESCE(requests.maintenance_open_count, 0),
+                       COALESCE(invoices.unpaid_invoice_count, 0),
+                       %(uid)s, %(now)s, %(uid)s, %(now)s
+                  FROM partners
+             LEFT JOIN leases USING (partner_id)
+             LEFT JOIN requests USING (partner_id)
+             LEFT JOIN invoices USING (partner_id)
+                 WHERE partners.partner_id IS NOT NULL
+                ON CONFLICT (partner_id) DO UPDATE
+                   SET lease_count = EXCLUDED.lease_count,
+                       maintenance_count = EXCLUDED.maintenance_count,
+                       maintenance_open_count = EXCLUDED.maintenance_open_count,
+                       unpaid_invoice_count = EXCLUDED.unpaid_invoice_count,
+                       write_uid = EXCLUDED.write_uid,
+                       write_date = EXCLUDED.write_date
+                """,
+                table=SQL.identifier(self._table),
+                partner_filter=partner_filter,
+                extra_partners=extra_partners,
+                uid=self.env.uid,
+                now=now,
+            )
+        )
+        self.invalidate_model()
+
+    @api.model
+    def reconcile_counters(self):
+        """Rebuild every tenant counter from scratch."""
+        with self.env["property.perf.run"]._track("tenant_counters"):
+            self._refresh()
@@ -1,5 +1,46 @@
 # -*- coding: utf-8 -*-
+import logging
+import threading
+from collections import OrderedDict
+
 from odoo import api, fields, models
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+TENANT_UNIT_CACHE_SIZE = 8192
+
+
+class TenantUnitCache:
+    """Allowed unit ids per tenant of this process, evicted least recently used first.
+
+    Entries are stored with the version of the tenant's counters, which are
+    refreshed by every transaction changing the tenant's leases: a stale
+    entry is never returned, whichever worker made the change.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, version, unit_ids):
+        with self._lock:
+            self._entries[key] = (unit_ids, version)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+tenant_unit_cache = TenantUnitCache(TENANT_UNIT_CACHE_SIZE)
 
 
 class PropertyUnit(models.Model):
@@ -25,6 +66,13 @@ class PropertyUnit(models.Model):
     current_tenant_id = fields.Many2one(
         "res.partner", compute="_compute_current_lease", store=True
     )
+    tenant_commercial_partner_id = fields.Many2one(
+        "res.partner",
+        string="Tenant Company",
+        compute="_compute_tenant_commercial_partner",
+        store=True,
+        index=True,
+    )
 
     company_id = fields.Many2one(
         "res.company", required=True, default=lambda self: self.env.company
@@ -35,11 +83,10 @@ class PropertyUnit(models.Model):
 
     @api.model_create_multi
     def create(self, vals_list):
-        for vals in vals_list:
-            if vals.get("code", "New") == "New":
-                vals["code"] = (
-                    self.env["ir.sequence"].next_by_code("property.unit") or "New"
-                )
+        to_number = [vals for vals in vals_list if vals.get("code", "New") == "New"]
+        codes = self.env["ir.sequence"]._next_by_code_batch("property.unit", len(to_number))
+        for vals, code in zip(to_number, codes):
+            vals["code"] = code or "New"
         return super().create(vals_list)
 
     def name_get(self):
@@ -52,21 +99,122 @@ class PropertyUnit(models.Model):
             result.append((rec.id, name))
         return result
 
+    @api.model
+    def _get_tenant_unit_ids(self, commercial_partner_id):
+        """Return the ids of the units the tenant currently holds an active lease on."""
+        key = (self.env.cr.dbname, commercial_partner_id)
+        version = self.env["property.tenant.counter"]._get_version(commercial_partner_id)
+        if version is not None:
+            unit_ids = tenant_unit_cache.get(key, version)
+            if unit_ids is not None:
+                return unit_ids
+        leases = self.env["property.lease"].sudo().search_fetch(
+            [("tenant_commercial_partner_id", "=", commercial_partner_id), ("state", "=", "active")],
+            ["unit_id"],
+        )
+        unit_ids = frozenset(leases.unit_id.ids)
+        if version is not None:
+            tenant_unit_cache.set(key, version, unit_ids)
+        return unit_ids
+
     @api.depends("lease_ids.state", "lease_ids.start_date", "lease_ids.end_date")
     def _compute_current_lease(self):
         today = fields.Date.context_today(self)
+        Lease = self.env["property.lease"]
+        # One query for the whole recordset; leases come newest first, so
+        # the first one seen for a unit is its current lease.
+        leases = Lease.search_fetch(
+            [
+                ("unit_id", "in", self._origin.ids),
+                ("state", "=", "active"),
+                ("start_date", "<=", today),
+                "|",
+                ("end_date", "=", False),
+                ("end_date", ">=", today),
+            ],
+            ["unit_id", "tenant_id"],
+            order="start_date desc, id desc",
+        )
+        current_leases = {}
+        for lease in leases:
+            current_leases.setdefault(lease.unit_id.id, lease)
         for unit in self:
-            lease = self.env["property.lease"].search(
-                [
-                    ("unit_id", "=", unit.id),
-                    ("state", "=", "active"),
-                    ("start_date", "<=", today),
-                    "|",
-                    ("end_date", "=", False),
-                    ("end_date", ">=", today),
-                ],
-                order="start_date desc, id desc",
-                limit=1,
-            )
+            lease = current_leases.get(unit._origin.id, Lease)
             unit.current_lease_id = lease
-            unit.current_tenant_id = lease.tenant_id if lease else False
+            unit.current_tenant_id = lease.tenant_id
+
+    @api.depends(
+        "lease_ids.state",
+        "lease_ids.start_date",
+        "lease_ids.active",
+        "lease_ids.tenant_commercial_partner_id",
+    )
+    def _compute_tenant_commercial_partner(self):
+        # Portal access follows the tenant of the newest active lease. Active
+        # leases of a unit may overlap on purpose (a handover, a signed
+        # renewal): the outgoing tenant then keeps their lease and invoices
+        # but loses the unit and its maintenance requests on the portal.
+        leases = self.env["property.lease"].search_fetch(
+            [("unit_id", "in", self._origin.ids), ("state", "=", "active")],
+            ["unit_id", "tenant_commercial_partner_id"],
+            order="start_date desc, id desc",
+        )
+        partners = {}
+        for lease in leases:
+            partners.setdefault(lease.unit_id.id, lease.tenant_commercial_partner_id)
+        for unit in self:
+            unit.tenant_commercial_partner_id = partners.get(unit._origin.id, False)
+
+    @api.model
+    def _get_stale_current_lease_unit_ids(self, today):
+        """Return the ids of units whose current lease changed with the date."""
+        self.env["property.lease"].flush_model(["unit_id", "state", "start_date", "end_date"])
+        self.flush_model(["current_lease_id"])
+        self.env.cr.execute(
+            SQL(
+                """
+                SELECT unit.id
+                  FROM property_unit unit
+             LEFT JOIN property_lease cur ON cur.id = unit.current_lease_id
+                 WHERE (
+                           cur.id IS NOT NULL
+                           AND (cur.state != 'active' OR cur.start_date > %(today)s OR cur.end_date < %(today)s)
+                       )
+                    OR EXISTS (
+                           SELECT 1
+                             FROM property_lease lease
+                            WHERE lease.unit_id = unit.id
+                              AND lease.state = 'active'
+                              AND lease.start_date <= %(today)s
+                              AND (lease.end_date IS NULL OR lease.end_date >= %(today)s)
+                              AND (cur.id IS NULL OR (lease.start_date, lease.id) > (cur.start_date, cur.id))
+                       )
+                """,
+                today=today,
+            )
+        )
+        return [row[0] for row in self.env.cr.fetchall()]
+
+    @api.model
+    def _sync_occupancy(self, today):
+        """Bring the current lease and the status of every unit in line with ``today``.
+
+        Only units whose current lease changed with the date are recomputed,
+        then the occupancy status is realigned with two bulk writes.
+        Returns the number of units updated.
+        """
+        units = self.browse(self._get_stale_current_lease_unit_ids(today))
+        for field_name in ("current_lease_id", "current_tenant_id"):
+            self.env.add_to_compute(self._fields[field_name], units)
+        units.flush_recordset(["current_lease_id", "current_tenant_id"])
+        occupied = self.search([("current_lease_id", "!=", False), ("status", "=", "vacant")])
+        vacant = self.search([("current_lease_id", "=", False), ("status", "=", "occupied")])
+        occupied.write({"status": "occupied"})
+        vacant.write({"status": "vacant"})
+        _logger.info(
+            "Recomputed the current lease of %s units, %s units now occupied and %s vacant",
+            len(units),
+            len(occupied),
+            len(vacant),
+        )
+        return len(units | occupied | vacant)
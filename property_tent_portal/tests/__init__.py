@@ -0,0 +1,12 @@
+from . import test_lease_lifecycle
+from . import test_maintenance_lease
+from . import test_maintenance_photo
+from . import test_payment_access_token
+from . import test_performance
+from . import test_query_plans
+from . import test_rent_roll_report
+from . import test_rent_sms_dispatch
+from . import test_rent_sms_paid
+from . import test_statement_export
+from . import test_tenant_unit_cache
+from . import test_unit_current_lease
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+import time
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import fields
+
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+
+
+class PropertyTestCommon(AccountTestInvoicingCommon):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env = cls.env(context=dict(cls.env.context, tracking_disable=True))
+        cls.today = fields.Date.context_today(cls.env.user)
+        cls.rent_product = cls.env["product.product"].create(
+            {"name": "Rent", "type": "service", "sale_ok": True, "taxes_id": [(6, 0, [])]}
+        )
+        cls.property = cls.env["property.property"].create({"name": "Test Property"})
+
+    @classmethod
+    def _create_tenants(cls, count, prefix="Tenant"):
+        return cls.env["res.partner"].create(
+            [{"name": "%s %s" % (prefix, i), "mobile": "+3245500%04d" % i} for i in range(count)]
+        )
+
+    @classmethod
+    def _create_units(cls, count, prop=None):
+        return cls.env["property.unit"].create(
+            [
+                {"name": "Unit %s" % i, "property_id": (prop or cls.property).id, "rent_amount": 1000.0}
+                for i in range(count)
+            ]
+        )
+
+    @classmethod
+    def _create_leases(cls, units, tenants, start_date=None, activate=True, **vals):
+        leases = cls.env["property.lease"].create(
+            [
+                {
+                    "unit_id": unit.id,
+                    "tenant_id": tenant.id,
+                    "start_date": start_date or cls.today,
+                    "rent_amount": 1000.0,
+                    "rent_product_id": cls.rent_product.id,
+                    **vals,
+                }
+                for unit, tenant in zip(units, tenants)
+            ]
+        )
+        if activate:
+            leases.action_activate()
+        return leases
+
+    @classmethod
+    def _generate_portfolio(cls, scale):
+        """Create a realistic portfolio of ``scale`` units, leases and tenants.
+
+        Roughly 50 units per property and one maintenance request for ten
+        units; leases started within the last three months so invoicing has
+        a small catch-up backlog.
+        """
+        tenants = cls.env["res.partner"].create(
+            [{"name": "Portfolio Tenant %s" % i, "mobile": "+3245600%04d" % (i % 10000)} for i in range(scale)]
+        )
+        properties = cls.env["property.property"].create(
+            [{"name": "Portfolio Property %s" % i} for i in range(max(1, scale // 50))]
+        )
+        property_codes = properties.mapped("code")
+        rows = [
+            {
+                "property_code": property_codes[i % len(property_codes)],
+                "unit_name": "Unit %s" % i,
+                "tenant_id": tenants[i].id,
+                "start_date": fields.Date.to_string(cls.today - relativedelta(months=i % 3, days=i % 28)),
+                "rent_amount": 1000 + i % 500,
+            }
+            for i in range(scale)
+        ]
+        report = cls.env["property.lease.import"].import_rows(rows, default_rent_product_id=cls.rent_product.id)
+        assert not report["errors"], report["errors"][:5]
+        leases = cls.env["property.lease"].search([("tenant_id", "in", tenants.ids)])
+        requests = cls.env["property.maintenance.request"].create(
+            [
+                {"tenant_id": lease.tenant_id.id, "unit_id": lease.unit_id.id, "description": "Leaking tap"}
+                for lease in leases[::10]
+            ]
+        )
+        return {"tenants": tenants, "properties": properties, "leases": leases, "requests": requests}
+
+    @classmethod
+    def _create_portal_user(cls, partner):
+        login = "portal-%s" % partner.id
+        return cls.env["res.users"].with_context(no_reset_password=True).create(
+            {
+                "name": partner.name,
+                "login": login,
+                "password": login,
+                "partner_id": partner.id,
+                "groups_id": [(6, 0, [cls.env.ref("base.group_portal").id])],
+            }
+        )
+
+    def _recompute(self, records, field_names):
+        self.env.invalidate_all()
+        for field_name in field_names:
+            self.env.add_to_compute(records._fields[field_name], records)
+        records.flush_recordset(field_names)
+
+    def _count_queries(self, func):
+        """Return the number of queries ``func`` issues, flushes included."""
+        self.env.flush_all()
+        queries = self.env.cr.sql_log_count
+        func()
+        self.env.flush_all()
+        return self.env.cr.sql_log_count - queries
+
+    def _measure(self, label, func):
+        self.env.flush_all()
+        queries = self.env.cr.sql_log_count
+        started = time.perf_counter()
+        func()
+        self.env.flush_all()
+        return {
+            "label": label,
+            "duration": time.perf_counter() - started,
+            "queries": self.env.cr.sql_log_count - queries,
+        }
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+from dateutil.relativedelta import relativedelta
+
+from odoo.tests import tagged
+
+from odoo.addons.property_tent_portal.tests.common import PropertyTestCommon
+
+
+@tagged("post_install", "-at_install")
+class TestLeaseLifecycle(PropertyTestCommon):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.units = cls._create_units(2)
+        cls.tenants = cls._create_tenants(2)
+        cls.leases = cls._create_leases(
+            cls.units,
+            cls.tenants,
+            start_date=cls.today - relativedelta(months=3),
+            end_date=cls.today - relativedelta(days=10),
+        )
+
+    def test_unbilled_leases_are_ended_once_invoiced(self):
+        billed, unbilled = self.leases
+        billed.next_invoice_date = billed.end_date + relativedelta(days=1)
+        Lease = self.env["property.lease"]
+
+        Lease.cron_lease_lifecycle()
+        self.assertEqual(billed.state, "ended")
+        self.assertEqual(unbilled.state, "active")
+
+        Lease.cron_generate_rent_invoices()
+        self.assertGreater(unbilled.next_invoice_date, unbilled.end_date)
+        invoices = self.env["account.move"].search([("property_lease_id", "=", unbilled.id)])
+        self.assertEqual(len(invoices), 3)
+
+        Lease.cron_lease_lifecycle()
+        self.assertEqual(unbilled.state, "ended")
+
+    def test_invoice_template_follows_the_sale_journal(self):
+        lease = self.leases[0]
+        template = lease._get_invoice_templates()[lease.id]
+        journal = self.env["account.journal"].create(
+            {"name": "Rent", "code": "RENT", "type": "sale", "sequence": 0, "company_id": lease.company_id.id}
+        )
+        self.assertNotEqual(template["journal_id"], journal.id)
+        template = lease._get_invoice_templates()[lease.id]
+        self.assertEqual(template["journal_id"], journal.id)
+        self.assertEqual(lease.invoice_template, template)
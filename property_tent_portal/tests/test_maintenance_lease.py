@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import math
+
+from odoo.exceptions import ValidationError
+from odoo.models import PREFETCH_MAX
+from odoo.tests import tagged
+
+from odoo.addons.property_tent_portal.tests.common import PropertyTestCommon
+
+
+@tagged("post_install", "-at_install")
+class TestMaintenanceLease(PropertyTestCommon):
+    # Two prefetch batches: enough to show the count grows by batch only.
+    LARGE_SIZE = 2 * PREFETCH_MAX
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.units = cls._create_units(100)
+        cls.tenants = cls._create_tenants(100)
+        cls.leases = cls._create_leases(cls.units, cls.tenants)
+        cls.portal_user = cls._create_portal_user(cls.tenants[0])
+
+    def _create_requests(self, count):
+        return self.env["property.maintenance.request"].create(
+            [
+                {
+                    "tenant_id": self.tenants[i % 100].id,
+                    "unit_id": self.units[i % 100].id,
+                    "description": "Request %s" % i,
+                }
+                for i in range(count)
+            ]
+        )
+
+    def test_lease_is_resolved(self):
+        requests = self._create_requests(3)
+        self.assertEqual(requests.lease_id, self.leases[:3])
+        other_unit = self.env["property.maintenance.request"].create(
+            {"tenant_id": self.tenants[0].id, "unit_id": self.units[1].id, "description": "Wrong unit"}
+        )
+        self.assertFalse(other_unit.lease_id)
+
+    def test_query_count_is_constant(self):
+        large_size = self.LARGE_SIZE
+        requests = self._create_requests(large_size)
+        counts = {}
+        for size in (1, 100, large_size):
+            batch = requests[:size]
+            compute_count = self._count_queries(lambda: self._recompute(batch, ["lease_id"]))
+            # The portal constraint reads lease_id from the same batched compute.
+            self.env.invalidate_all()
+            self.env.add_to_compute(batch._fields["lease_id"], batch)
+            check_count = self._count_queries(
+                lambda: batch.with_user(self.portal_user).sudo()._check_tenant_unit_link()
+            )
+            counts[size] = (compute_count, check_count)
+        self.assertEqual(counts[1], counts[100], "Queries per size: %s" % counts)
+        # Records are read and flushed by batches of PREFETCH_MAX: past one
+        # batch the count may only grow by batch, never by request.
+        extra_batches = math.ceil(large_size / PREFETCH_MAX) - 1
+        for small, large in zip(counts[1], counts[large_size]):
+            self.assertLessEqual(large, small + 2 * extra_batches, "Queries per size: %s" % counts)
+
+    def test_portal_tenant_needs_a_lease_on_the_unit(self):
+        request = self.env["property.maintenance.request"].create(
+            {"tenant_id": self.tenants[0].id, "unit_id": self.units[1].id, "description": "Wrong unit"}
+        )
+        with self.assertRaises(ValidationError):
+            request.with_user(self.portal_user).sudo()._check_tenant_unit_link()
+
+
+@tagged("post_install", "-at_install", "-standard", "property_bench")
+class TestMaintenanceLease10k(TestMaintenanceLease):
+    LARGE_SIZE = 10000
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import base64
+import io
+
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+from odoo.exceptions import ValidationError
+from odoo.tests import tagged
+from odoo.tools.image import image_to_base64
+
+from odoo.addons.property_tent_portal.tests.common import PropertyTestCommon
+
+
+@tagged("post_install", "-at_install")
+class TestMaintenancePhoto(PropertyTestCommon):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.units = cls._create_units(1)
+        cls.tenants = cls._create_tenants(1)
+        cls._create_leases(cls.units, cls.tenants)
+        cls.request = cls.env["property.maintenance.request"].create(
+            {"tenant_id": cls.tenants.id, "unit_id": cls.units.id, "description": "Leak"}
+        )
+
+    def _make_upload(self, content, filename="photo.png"):
+        return FileStorage(stream=io.BytesIO(content), filename=filename)
+
+    def _make_png(self):
+        return base64.b64decode(image_to_base64(Image.new("RGB", (512, 512), "red"), "PNG"))
+
+    def test_upload_is_stored_in_the_filestore(self):
+        content = self._make_png()
+        photo = self.env["property.maintenance.photo"]._create_from_uploads(
+            self.request, [self._make_upload(content)]
+        )
+        attachment = photo.attachment_id
+        self.assertTrue(attachment.store_fname)
+        self.assertEqual(attachment.file_size, len(content))
+        self.assertEqual(attachment.raw, content)
+        self.assertEqual(attachment.mimetype, "image/png")
+
+    def test_upload_limits(self):
+        Photo = self.env["property.maintenance.photo"]
+        with self.assertRaises(ValidationError):
+            Photo._stream_upload_to_attachment(self._make_upload(b"not an image", "notes.txt"), self.request)
+        uploads = [self._make_upload(self._make_png()) for _i in range(Photo._max_upload_count() + 1)]
+        with self.assertRaises(ValidationError):
+            Photo._create_from_uploads(self.request, uploads)
+
+    def test_thumbnail_states(self):
+        Photo = self.env["property.maintenance.photo"]
+        photo = Photo._create_from_uploads(self.request, [self._make_upload(self._make_png())])
+        broken = Photo._create_from_uploads(self.request, [self._make_upload(self._make_png())])
+        broken.attachment_id.raw = b"GIF89a broken"
+        Photo.cron_generate_thumbnails()
+        self.assertEqual(photo.thumbnail_state, "done")
+        self.assertTrue(photo.thumbnail)
+        self.assertEqual(broken.thumbnail_state, "failed")
+        self.assertFalse(Photo.search([("id", "in", (photo | broken).ids), ("thumbnail_state", "=", "pending")]))
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+from unittest.mock import patch
+
+from odoo.exceptions import AccessError, MissingError
+from odoo.tests import tagged
+from odoo.tools import SQL
+
+from odoo.addons.property_tent_portal.tests.common import PropertyTestCommon
+
+
+@tagged("post_install", "-at_install")
+class TestPaymentAccessToken(PropertyTestCommon):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.units = cls._create_units(2)
+        cls.tenants = cls._create_tenants(2)
+        cls.leases = cls._create_leases(cls.units, cls.tenants)
+        cls.invoices = cls.env["account.move"]
+        for lease in cls.leases:
+            cls.invoices |= lease._generate_rent_invoices({lease.id: [cls.today]})
+        cls.portal_user = cls._create_portal_user(cls.tenants[0])
+
+    def _clear_tokens(self, invoices):
+        self.env.cr.execute(SQL("UPDATE account_move SET access_token = NULL WHERE id = ANY(%s)", invoices.ids))
+        invoices.invalidate_recordset(["access_token"])
+
+    def test_tokens_are_generated_when_posting(self):
+        self.assertTrue(all(self.invoices.mapped("access_token")))
+        self.assertEqual(len(set(self.invoices.mapped("access_token"))), 2)
+
+    def test_payment_token_is_read_only(self):
+        invoice = self.invoices[0]
+        Move = self.env(user=self.portal_user)["account.move"]
+        with patch.object(type(Move), "_portal_ensure_token") as ensure_token:
+            self.assertEqual(Move._get_payment_access_token(invoice.id), invoice.access_token)
+            ensure_token.assert_not_called()
+        # The result is kept for the rest of the request.
+        with self.assertQueryCount(0):
+            Move._get_payment_access_token(invoice.id)
+
+    def test_missing_token_is_generated_once(self):
+        invoice = self.invoices[0]
+        self._clear_tokens(invoice)
+        token = self.env(user=self.portal_user)["account.move"]._get_payment_access_token(invoice.id)
+        self.assertTrue(token)
+        self.assertEqual(invoice.access_token, token)
+
+    def test_payment_token_errors(self):
+        Move = self.env(user=self.portal_user)["account.move"]
+        with self.assertRaises(AccessError):
+            Move._get_payment_access_token(self.invoices[1].id)
+        missing_id = self.env["account.move"].search([], order="id desc", limit=1).id + 1
+        with self.assertRaises(MissingError):
+            Move._get_payment_access_token(missing_id)
@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+import logging
+from unittest.mock import patch
+
+from odoo.tests import HttpCase, tagged
+from odoo.tools import SQL
+
+from odoo.addons.account_payment.tests.common import AccountPaymentCommon
+from odoo.addons.property_tent_portal.controllers.portal import keyset_page, portal_render_cache
+from odoo.addons.property_tent_portal.tests.common import PropertyTestCommon
+
+_logger = logging.getLogger(__name__)
+
+# Maximum number of queries per hot path. Budgets must not depend on the
+# size of the portfolio: a path above its budget is a regression.
+QUERY_BUDGETS = {
+    "compute_current_lease": 60,
+    "compute_maintenance_lease": 60,
+    "portal_home_counters": 2,
+    "portal_my_leases": 4,
+    "portal_my_maintenance": 4,
+    "portal_lease_detail": 4,
+    "portal_maintenance_units": 2,
+}
+
+# Maximum number of queries of a whole request on a warm worker: session,
+# routing, website and layout included, page render cache cleared.
+ROUTE_QUERY_BUDGETS = {
+    "/my/leases": 40,
+    "/my/maintenance": 40,
+    "/invoice/transaction": 60,
+}
+
+# Maximum number of queries of the daily rerun of each cron, once the work of
+# the day is done: the selection of the due records must not scan row by row.
+CRON_QUERY_BUDGETS = {
+    "cron_generate_rent_invoices": 25,
+    "cron_lease_lifecycle": 20,
+    "cron_compute_arrears": 15,
+    "cron_send_rent_sms_reminders": 15,
+    "cron_dispatch_rent_sms": 15,
+    "cron_refresh_rent_roll": 15,
+    "cron_reconcile_counters": 15,
+    "cron_archive_history": 20,
+}
+
+
+class PropertyPerformanceCommon(PropertyTestCommon):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.portfolio = cls._generate_portfolio(cls.PORTFOLIO_SCALE)
+        cls.env["property.lease"].cron_generate_rent_invoices()
+        cls.lease = cls.portfolio["leases"][0]
+        cls.portal_user = cls._create_portal_user(cls.lease.tenant_id)
+        cls.partner = cls.portal_user.partner_id.commercial_partner_id
+
+    def _get_hot_paths(self):
+        """Return ``(label, function)`` for each hot path of the module."""
+        env = self.env(user=self.portal_user)
+        partner, lease = self.partner, self.lease
+        return [
+            (
+                "compute_current_lease",
+                lambda: self._recompute(self.portfolio["leases"].unit_id, ["current_lease_id", "current_tenant_id"]),
+            ),
+            (
+                "compute_maintenance_lease",
+                lambda: self._recompute(self.portfolio["requests"], ["lease_id"]),
+            ),
+            (
+                "portal_home_counters",
+                lambda: env["property.tenant.counter"]._get_counters(partner).lease_count,
+            ),
+            (
+                "portal_my_leases",
+                lambda: keyset_page(
+                    env["property.lease"],
+                    [("tenant_commercial_partner_id", "=", partner.id)],
+                    "start_date",
+                    ["name", "unit_id", "start_date", "end_date", "rent_amount", "state"],
+                    "/my/leases",
+                )[0].unit_id.sudo().fetch(["name"]),
+            ),
+            (
+                "portal_my_maintenance",
+                lambda: keyset_page(
+                    env["property.maintenance.request"],
+                    [("tenant_commercial_partner_id", "=", partner.id)],
+                    "request_date",
+                    ["name", "unit_id", "request_date", "issue_type", "state"],
+                    "/my/maintenance",
+                )[0].unit_id.sudo().fetch(["name"]),
+            ),
+            (
+                "portal_lease_detail",
+                lambda: (
+                    keyset_page(
+                        env["account.move"],
+                        [("property_lease_id", "=", lease.id), ("invoice_date", "!=", False)],
+                        "invoice_date",
+                        ["name", "invoice_date", "invoice_date_due", "amount_total", "amount_residual", "state"],
+                        "/my/leases/%s" % lease.id,
+                    ),
+                    env["account.move"]._read_group(
+                        [("property_lease_id", "=", lease.id), ("state", "=", "posted")],
+                        aggregates=["amount_total_signed:sum", "amount_residual_signed:sum"],
+                    ),
+                ),
+            ),
+            (
+                "portal_maintenance_units",
+                lambda: env["property.unit"]._get_tenant_unit_ids(partner.id),
+            ),
+        ]
+
+    def _get_cron_entry_points(self):
+        """Return ``(label, function)`` for each scheduled action of the module."""
+        env = self.env
+        return [
+            ("cron_generate_rent_invoices", env["property.lease"].cron_generate_rent_invoices),
+            ("cron_lease_lifecycle", env["property.lease"].cron_lease_lifecycle),
+            ("cron_compute_arrears", env["property.arrears.snapshot"].cron_compute_arrears),
+            ("cron_send_rent_sms_reminders", env["account.move"].cron_send_rent_sms_reminders),
+            ("cron_dispatch_rent_sms", env["property.rent.sms"].cron_dispatch_rent_sms),
+            ("cron_refresh_rent_roll", env["property.rent.roll.report"].cron_refresh),
+            ("cron_reconcile_counters", env["property.tenant.counter"].reconcile_counters),
+            ("cron_archive_history", env["property.archive"].cron_archive_history),
+        ]
+
+
+@tagged("post_install", "-at_install")
+class TestQueryBudgets(PropertyPerformanceCommon):
+    PORTFOLIO_SCALE = 100
+
+    def test_hot_path_query_budgets(self):
+        for label, func in self._get_hot_paths():
+            with self.subTest(path=label):
+                self.env.invalidate_all()
+                with self.assertQueryCount(QUERY_BUDGETS[label]):
+                    func()
+
+    def test_cron_query_budgets(self):
+        Sms = self.env["property.rent.sms"]
+        self.startPatcher(patch.object(type(Sms), "_gateway_send"))
+        self.startPatcher(patch.object(type(Sms), "_dispatch_rate_limit", return_value=1000000))
+        for label, func in self._get_cron_entry_points():
+            with self.subTest(cron=label):
+                # The first run does the work of the day, the rerun only looks for it.
+                func()
+                self.env.invalidate_all()
+                with self.assertQueryCount(CRON_QUERY_BUDGETS[label]):
+                    func()
+
+
+@tagged("post_install", "-at_install", "-standard", "property_bench")
+class TestBenchmark(PropertyPerformanceCommon):
+    """Time the crons and hot paths on a generated portfolio.
+
+    Opt-in with ``--test-tags property_bench``. Each result is logged on one
+    ``BENCH`` line so the runs of two releases can be compared, and the
+    query budgets are enforced at scale too.
+    """
+
+    PORTFOLIO_SCALE = 1000
+
+    def test_benchmark(self):
+        scale = self.PORTFOLIO_SCALE
+        results = [
+            self._measure("cron_generate_rent_invoices", self.env["property.lease"].cron_generate_rent_invoices),
+            self._measure("cron_send_rent_sms_reminders", self.env["account.move"].cron_send_rent_sms_reminders),
+        ]
+        for label, func in self._get_hot_paths():
+            self.env.invalidate_all()
+            results.append(self._measure(label, func))
+        for result in results:
+            _logger.info(
+                "BENCH %(label)s scale=%(scale)s duration=%(duration).3fs queries=%(queries)s",
+                dict(result, scale=scale),
+            )
+        for result in results:
+            budget = QUERY_BUDGETS.get(result["label"])
+            if budget is not None:
+                self.assertLessEqual(result["queries"], budget, "%s is over its query budget" % result["label"])
+
+    def test_pay_now(self):
+        """Compare the Pay Now token lookup with tokens written on demand and pre-generated."""
+        invoices = self.env["account.move"].search(
+            [("property_lease_id", "!=", False), ("move_type", "=", "out_invoice"), ("state", "=", "posted")],
+            limit=200,
+        )
+        Move = self.env["account.move"]
+
+        def on_demand():
+            for invoice in invoices:
+                invoice.check_access("read")
+                invoice._portal_ensure_token()
+
+        def read_only():
+            for invoice in invoices:
+                Move._get_payment_access_token(invoice.id)
+
+        pre_generated = {invoice.id: invoice.access_token for invoice in invoices}
+        self.env.cr.execute(SQL("UPDATE account_move SET access_token = NULL WHERE id = ANY(%s)", invoices.ids))
+        self.env.invalidate_all()
+        results = [self._measure("pay_now_on_demand", on_demand)]
+        self.env.cr.execute(
+            SQL(
+                "UPDATE account_move AS move SET access_token = token.value FROM (VALUES %s) AS token(id, value) "
+                "WHERE move.id = token.id",
+                SQL(", ").join(SQL("(%s, %s)", invoice_id, token) for invoice_id, token in pre_generated.items()),
+            )
+        )
+        self.env.invalidate_all()
+        results.append(self._measure("pay_now_read_only", read_only))
+        for result in results:
+            _logger.info(
+                "BENCH %(label)s requests=%(requests)s duration=%(duration).3fs queries=%(queries)s",
+                dict(result, requests=len(invoices)),
+            )
+        # The read-only path served the pre-generated tokens as they were.
+        self.assertEqual({invoice.id: invoice.access_token for invoice in invoices}, pre_generated)
+
+
+@tagged("post_install", "-at_install", "-standard", "property_bench")
+class TestBenchmark10k(TestBenchmark):
+    PORTFOLIO_SCALE = 10000
+
+
+@tagged("post_install", "-at_install", "-standard", "property_bench")
+class TestBenchmark100k(TestBenchmark):
+    PORTFOLIO_SCALE = 100000
+
+
+@tagged("post_install", "-at_install")
+class TestPortalRoutes(PropertyPerformanceCommon, AccountPaymentCommon, HttpCase):
+    PORTFOLIO_SCALE = 20
+
+    def test_portal_routes(self):
+        request = self.portfolio["requests"].filtered(lambda r: r.tenant_id == self.lease.tenant_id)[:1] or (
+            self.env["property.maintenance.request"].create(
+                {"tenant_id": self.lease.tenant_id.id, "unit_id": self.lease.unit_id.id, "description": "Broken lock"}
+            )
+        )
+        self.authenticate(self.portal_user.login, self.portal_user.login)
+        routes = [
+            "/my",
+            "/my/leases",
+            "/my/leases/history",
+            "/my/leases/%s" % self.lease.id,
+            "/my/maintenance",
+            "/my/maintenance/history",
+            "/my/maintenance/new",
+            "/my/maintenance/%s" % request.id,
+        ]
+        for route in routes:
+            with self.subTest(route=route):
+                responses = []
+                result = self._measure(route, lambda: responses.append(self.url_open(route)))
+                self.assertEqual(responses[0].status_code, 200)
+                _logger.info("BENCH portal %(label)s duration=%(duration).3fs queries=%(queries)s", result)
+                etag = responses[0].headers.get("ETag")
+                if etag:
+                    # An unchanged page is revalidated without rendering it again.
+                    revalidation = self._measure(
+                        route, lambda: responses.append(self.url_open(route, headers={"If-None-Match": etag}))
+                    )
+                    self.assertEqual(responses[1].status_code, 304)
+                    self.assertLess(revalidation["queries"], result["queries"])
+
+    def test_route_query_budgets(self):
+        self.authenticate(self.portal_user.login, self.portal_user.login)
+        for route in ("/my/leases", "/my/maintenance"):
+            with self.subTest(route=route):
+                # Warm the routing and template caches, then render the page again.
+                self.url_open(route)
+                portal_render_cache.clear()
+                with self.assertQueryCount(ROUTE_QUERY_BUDGETS[route]):
+                    response = self.url_open(route)
+                self.assertEqual(response.status_code, 200)
+
+    def test_invoice_transaction_query_budget(self):
+        invoice = self.env["account.move"].search(
+            [("property_lease_id", "=", self.lease.id), ("state", "=", "posted")], limit=1
+        )
+        self.authenticate(self.portal_user.login, self.portal_user.login)
+        url = "/invoice/transaction/%s" % invoice.id
+        params = {
+            "provider_id": self.provider.id,
+            "payment_method_id": self.payment_method_id,
+            "token_id": None,
+            "amount": invoice.amount_residual,
+            "flow": "direct",
+            "tokenization_requested": False,
+            "landing_route": "/my/invoices/%s" % invoice.id,
+        }
+        self.make_jsonrpc_request(url, params)
+        with self.assertQueryCount(ROUTE_QUERY_BUDGETS["/invoice/transaction"]):
+            processing_values = self.make_jsonrpc_request(url, params)
+        self.assertTrue(processing_values["reference"])
+        transactions = self.env["payment.transaction"].search([("invoice_ids", "in", invoice.ids)])
+        self.assertEqual(len(transactions), 2)
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+from odoo.tests import tagged
+from odoo.tools import SQL
+
+from odoo.addons.property_tent_portal.tests.common import PropertyTestCommon
+
+
+@tagged("post_install", "-at_install")
+class TestQueryPlans(PropertyTestCommon):
+    """The hot queries must be served by an index, whatever the size of the tables."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.units = cls._create_units(3)
+        cls.tenants = cls._create_tenants(3)
+        cls.leases = cls._create_leases(cls.units, cls.tenants)
+
+    def _get_plan_checks(self):
+        """Return ``(label, table, query)`` for the hot queries that must stay index-backed."""
+        partner_id = self.tenants[0].id
+        lease_id = self.leases[0].id
+
+        def orm_query(model, domain, order=None, limit=None):
+            return self.env[model]._search(domain, order=order, limit=limit).select("id")
+
+        return [
+            (
+                "portal_my_leases",
+                "property_lease",
+                orm_query(
+                    "property.lease",
+                    [("tenant_commercial_partner_id", "=", partner_id)],
+                    order="start_date desc, id desc",
+                    limit=21,
+                ),
+            ),
+            (
+                "portal_my_maintenance",
+                "property_maintenance_request",
+                orm_query(
+                    "property.maintenance.request",
+                    [("tenant_commercial_partner_id", "=", partner_id)],
+                    order="request_date desc, id desc",
+                    limit=21,
+                ),
+            ),
+            (
+                "portal_lease_detail",
+                "account_move",
+                orm_query(
+                    "account.move",
+                    [("property_lease_id", "=", lease_id), ("invoice_date", "!=", False)],
+                    order="invoice_date desc, id desc",
+                    limit=21,
+                ),
+            ),
+            (
+                "tenant_unit_ids",
+                "property_lease",
+                orm_query(
+                    "property.lease",
+                    [("tenant_commercial_partner_id", "=", partner_id), ("state", "=", "active")],
+                ),
+            ),
+            (
+                "compute_current_lease",
+                "property_lease",
+                orm_query(
+                    "property.lease",
+                    [("unit_id", "in", self.units.ids), ("state", "=", "active")],
+                    order="start_date desc, id desc",
+                ),
+            ),
+            (
+                "rent_invoice_claim",
+                "property_lease",
+                self.env["property.lease"]._get_due_leases_query(self.today, 500, []),
+            ),
+            (
+                "rent_sms_candidates",
+                "account_move",
+                self.env["property.rent.sms"]._get_reminder_candidates_query(self.today, self.today),
+            ),
+        ]
+
+    def _find_seq_scans(self, plan, tables):
+        scans = []
+        if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in tables:
+            scans.append(plan["Relation Name"])
+        for subplan in plan.get("Plans", []):
+            scans += self._find_seq_scans(subplan, tables)
+        return scans
+
+    def test_hot_queries_use_an_index(self):
+        self.env.flush_all()
+        # With sequential scans disabled, the planner only falls back to one
+        # when no index can serve the query.
+        self.env.cr.execute(SQL("SET LOCAL enable_seqscan = off"))
+        try:
+            for label, table, query in self._get_plan_checks():
+                with self.subTest(query=label):
+                    self.env.cr.execute(SQL("EXPLAIN (FORMAT JSON) %s", query))
+                    plan = self.env.cr.fetchone()[0][0]["Plan"]
+                    self.assertFalse(self._find_seq_scans(plan, {table}), "Plan: %s" % plan)
+        finally:
+            self.env.cr.execute(SQL("RESET enable_seqscan"))
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+from dateutil.relativedelta import relativedelta
+
+from odoo.tests import tagged
+
+from odoo.addons.property_tent_portal.tests.common import PropertyTestCommon
+
+
+@tagged("post_install", "-at_install")
+class TestRentRollReport(PropertyTestCommon):
+    def test_unit_count_is_computed_per_month(self):
+        units = self._create_units(2)
+        self._create_leases(units[0], self._create_tenants(1), start_date=self.today - relativedelta(months=2))
+        Report = self.env["property.rent.roll.report"]
+        Report.cron_refresh()
+        rows = Report.search([("property_id", "=", self.property.id)])
+        counts = {row.month: (row.unit_count, row.occupied_unit_count) for row in rows}
+        this_month = self.today.replace(day=1)
+        # The unit created today is not part of the portfolio two months ago.
+        self.assertEqual(counts[this_month - relativedelta(months=2)], (1, 1))
+        self.assertEqual(counts[this_month][0], 2)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+from unittest.mock import patch
+
+from freezegun import freeze_time
+
+from odoo import fields
+from odoo.tests import tagged
+
+from odoo.addons.property_tent_portal.tests.common import PropertyTestCommon
+
+
+@tagged("post_install", "-at_install")
+class TestRentSmsDispatch(PropertyTestCommon):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.units = cls._create_units(5)
+        cls.tenants = cls._create_tenants(5)
+        cls.leases = cls._create_leases(cls.units, cls.tenants)
+        cls.invoices = cls.leases._generate_rent_invoices({lease.id: [cls.today] for lease in cls.leases})
+        cls.Sms = cls.env["property.rent.sms"]
+
+    def setUp(self):
+        super().setUp()
+        SmsClass = type(self.Sms)
+        self.sleep = self.startPatcher(patch("odoo.addons.property_tent_portal.models.rent_sms.time.sleep"))
+        self.startPatcher(patch.object(SmsClass, "_dispatch_batch_size", return_value=2))
+        self.startPatcher(patch.object(SmsClass, "_dispatch_rate_limit", return_value=1))
+
+    def _enqueue(self, invoices):
+        return self.Sms._enqueue(invoices, "due")
+
+    def test_dispatch_sends_pending_messages(self):
+        sms = self._enqueue(self.invoices)
+        with patch.object(type(self.Sms), "_gateway_send") as gateway_send:
+            self.Sms.cron_dispatch_rent_sms()
+        self.assertEqual(gateway_send.call_count, 5)
+        self.assertEqual(set(sms.mapped("state")), {"sent"})
+        self.assertTrue(all(sms.mapped("sent_at")))
+
+    def test_dispatch_is_throttled_without_commits(self):
+        self._enqueue(self.invoices)
+        with patch.object(type(self.Sms), "_gateway_send"):
+            self.Sms.cron_dispatch_rent_sms()
+        # Batches of 2, 2 and 1 messages at 1 message per second.
+        durations = [call.args[0] for call in self.sleep.call_args_list]
+        self.assertEqual(len(durations), 3)
+        for duration, expected in zip(durations, (2, 2, 1)):
+            self.assertLessEqual(duration, expected)
+            self.assertGreater(duration, expected - 1)
+
+    def test_failed_messages_are_retried_with_backoff(self):
+        sms = self._enqueue(self.invoices[0])
+        start = fields.Datetime.now()
+        max_attempts = self.Sms._dispatch_max_attempts()
+        with patch.object(type(self.Sms), "_gateway_send", side_effect=Exception("Gateway down")) as gateway_send:
+            now = start
+            for attempt in range(1, max_attempts + 1):
+                with freeze_time(now):
+                    self.Sms.cron_dispatch_rent_sms()
+                self.assertEqual(gateway_send.call_count, attempt)
+                self.assertEqual(sms.attempt_count, attempt)
+                self.assertEqual(sms.last_error, "Gateway down")
+                if attempt < max_attempts:
+                    self.assertEqual(sms.state, "pending")
+                    delay = sms.next_attempt_at - now
+                    self.assertEqual(delay, self.Sms._dispatch_retry_delay(attempt))
+                    self.assertEqual(delay, timedelta(minutes=5 * 2 ** (attempt - 1)))
+                    # Nothing is sent again before the retry delay is over.
+                    with freeze_time(sms.next_attempt_at - timedelta(seconds=1)):
+                        self.Sms.cron_dispatch_rent_sms()
+                    self.assertEqual(gateway_send.call_count, attempt)
+                    now = sms.next_attempt_at
+            self.assertEqual(sms.state, "failed")
+            # Failed messages are never picked up again.
+            with freeze_time(now + timedelta(days=1)):
+                self.Sms.cron_dispatch_rent_sms()
+            self.assertEqual(gateway_send.call_count, max_attempts)
+
+    def test_one_failure_does_not_block_the_batch(self):
+        sms = self._enqueue(self.invoices[:2])
+        failing = sms[0]
+
+        def gateway_send(record):
+            if record == failing:
+                raise Exception("Invalid number")
+
+        with patch.object(type(self.Sms), "_gateway_send", autospec=True, side_effect=gateway_send):
+            self.Sms.cron_dispatch_rent_sms()
+        self.assertEqual(failing.state, "pending")
+        self.assertEqual(failing.attempt_count, 1)
+        self.assertEqual(sms[1].state, "sent")
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from odoo.addons.property_tent_portal.models.account_move import RENT_PAID_STATES
+from odoo.addons.property_tent_portal.tests.common import PropertyTestCommon
+
+
+@tagged("post_install", "-at_install")
+class TestRentSmsPaid(PropertyTestCommon):
+    INVOICE_COUNT = 50
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.units = cls._create_units(cls.INVOICE_COUNT)
+        cls.tenants = cls._create_tenants(cls.INVOICE_COUNT)
+        cls.leases = cls._create_leases(cls.units, cls.tenants)
+        cls.invoices = cls.leases._generate_rent_invoices({lease.id: [cls.today] for lease in cls.leases})
+        cls.Sms = cls.env["property.rent.sms"]
+
+    def _pay(self, invoices):
+        # The payments reconcile the invoices: payment_state is recomputed,
+        # never written.
+        self.env["account.payment.register"].with_context(
+            active_model="account.move", active_ids=invoices.ids
+        ).create({})._create_payments()
+
+    def _get_paid_sms(self, invoices):
+        return self.Sms.search([("move_id", "in", invoices.ids), ("kind", "=", "paid")])
+
+    def test_reconciliation_queues_paid_sms_without_sending(self):
+        self.assertEqual(len(self.invoices), self.INVOICE_COUNT)
+        with patch.object(type(self.Sms), "_gateway_send") as gateway_send, patch.object(
+            type(self.Sms), "_dispatch_rate_limit", return_value=1000000
+        ):
+            self._pay(self.invoices)
+            self.assertTrue(all(state in RENT_PAID_STATES for state in self.invoices.mapped("payment_state")))
+            # Commit time: the messages are queued, the gateway is untouched.
+            self.env.cr.flush()
+            sms = self._get_paid_sms(self.invoices)
+            self.assertEqual(sms.move_id, self.invoices)
+            self.assertEqual(set(sms.mapped("state")), {"pending"})
+            self.assertEqual(gateway_send.call_count, 0)
+
+            self.Sms.cron_dispatch_rent_sms()
+            self.assertEqual(gateway_send.call_count, self.INVOICE_COUNT)
+        self.assertEqual(set(sms.mapped("state")), {"sent"})
+
+    def test_paid_sms_is_queued_once(self):
+        invoice = self.invoices[0]
+        self._pay(invoice)
+        self.env.cr.flush()
+        # Recomputing an already paid invoice is not a new transition.
+        self._recompute(invoice, ["payment_state"])
+        self.env.cr.flush()
+        self.assertEqual(len(self._get_paid_sms(invoice)), 1)
+
+
+@tagged("post_install", "-at_install", "-standard", "property_bench")
+class TestRentSmsPaid5k(TestRentSmsPaid):
+    INVOICE_COUNT = 5000
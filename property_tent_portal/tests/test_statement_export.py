@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+import csv
+import io
+import zipfile
+
+from odoo import fields
+from odoo.tests import HttpCase, tagged
+
+from odoo.addons.property_tent_portal.tests.common import PropertyTestCommon
+
+
+class StatementExportCommon(PropertyTestCommon):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.units = cls._create_units(2)
+        cls.tenants = cls._create_tenants(2)
+        cls.company = cls.env["res.partner"].create({"name": "Tenant Company", "is_company": True})
+        cls.tenants[1].parent_id = cls.company
+        cls.leases = cls._create_leases(cls.units, cls.tenants)
+        for lease in cls.leases:
+            lease._generate_rent_invoices({lease.id: [cls.today]})
+        cls.Export = cls.env["property.statement.export"]
+
+
+@tagged("post_install", "-at_install")
+class TestStatementExport(StatementExportCommon):
+    def _get_statement_lines(self, tenants):
+        chunks = self.Export._iter_statement_chunks(self.today, self.today, tenant_ids=tenants.ids)
+        return [row for rows in chunks for row in rows]
+
+    def test_individual_tenant(self):
+        lines = self._get_statement_lines(self.tenants[0])
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(lines[0][1], self.leases[0].name)
+        self.assertEqual(lines[0][-1], self.tenants[0].id)
+
+    def test_contact_of_a_company(self):
+        lines = self._get_statement_lines(self.tenants[1])
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(lines[0][-1], self.company.id)
+
+    def test_rent_roll_outstanding(self):
+        lines = [row for rows in self.Export._iter_rent_roll_chunks([self.property.id]) for row in rows]
+        outstanding = {row[4]: row[8] for row in lines if row[4]}
+        self.assertEqual(outstanding, {lease.name: 1000.0 for lease in self.leases})
+
+
+@tagged("post_install", "-at_install")
+class TestStatementExportRoute(StatementExportCommon, HttpCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.billing_user = cls.env["res.users"].create(
+            {
+                "name": "Billing User",
+                "login": "property-billing",
+                "password": "property-billing",
+                "groups_id": [(6, 0, [cls.env.ref("account.group_account_invoice").id])],
+            }
+        )
+
+    def _export(self, export_type, fmt):
+        day = fields.Date.to_string(self.today)
+        response = self.url_open(
+            "/property_tent_portal/export/%s?fmt=%s&date_from=%s&date_to=%s" % (export_type, fmt, day, day)
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.content
+
+    def test_download_exports(self):
+        self.authenticate(self.billing_user.login, self.billing_user.login)
+        rows = list(csv.reader(io.StringIO(self._export("statement", "csv").decode())))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual({row[1] for row in rows[1:]}, set(self.leases.mapped("name")))
+        # XLSX workbooks and the PDF archive are both zip files.
+        self.assertTrue(zipfile.is_zipfile(io.BytesIO(self._export("rent_roll", "xlsx"))))
+
+    def test_export_needs_billing_rights(self):
+        user = self.env["res.users"].create(
+            {
+                "name": "Internal User",
+                "login": "property-internal",
+                "password": "property-internal",
+                "groups_id": [(6, 0, [self.env.ref("base.group_user").id])],
+            }
+        )
+        self.authenticate(user.login, user.login)
+        response = self.url_open("/property_tent_portal/export/statement?fmt=csv")
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from odoo.tests import tagged
+
+from odoo.addons.property_tent_portal.tests.common import PropertyTestCommon
+
+
+@tagged("post_install", "-at_install")
+class TestTenantUnitCache(PropertyTestCommon):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.units = cls._create_units(3)
+        cls.tenants = cls._create_tenants(2)
+        cls.leases = cls._create_leases(cls.units[:2], [cls.tenants[0]] * 2)
+        cls.Unit = cls.env["property.unit"]
+
+    def _commit(self):
+        # Run the precommit hooks, which refresh the counters of the tenants.
+        self.env.cr.flush()
+
+    def test_units_are_cached_until_the_leases_change(self):
+        tenant = self.tenants[0]
+        self._commit()
+        self.assertEqual(self.Unit._get_tenant_unit_ids(tenant.id), set(self.units[:2].ids))
+        with self.assertQueryCount(1):
+            self.assertEqual(self.Unit._get_tenant_unit_ids(tenant.id), set(self.units[:2].ids))
+
+        self.leases[0].action_end()
+        self._commit()
+        self.assertEqual(self.Unit._get_tenant_unit_ids(tenant.id), {self.units[1].id})
+
+        self.leases[1].unit_id = self.units[2]
+        self._commit()
+        self.assertEqual(self.Unit._get_tenant_unit_ids(tenant.id), {self.units[2].id})
+
+    def test_pending_changes_are_not_cached(self):
+        tenant = self.tenants[1]
+        self._commit()
+        self.assertFalse(self.Unit._get_tenant_unit_ids(tenant.id))
+        self._create_leases(self.units[2], tenant)
+        self.assertEqual(self.Unit._get_tenant_unit_ids(tenant.id), {self.units[2].id})
+        self._commit()
+        with self.assertQueryCount(2):
+            self.assertEqual(self.Unit._get_tenant_unit_ids(tenant.id), {self.units[2].id})
+
+    def test_contact_moved_to_another_company(self):
+        company = self.env["res.partner"].create({"name": "Tenant Company", "is_company": True})
+        self._commit()
+        self.assertFalse(self.Unit._get_tenant_unit_ids(company.id))
+        self.tenants[0].parent_id = company
+        self._commit()
+        self.assertEqual(self.Unit._get_tenant_unit_ids(company.id), set(self.units[:2].ids))
+        self.assertFalse(self.Unit._get_tenant_unit_ids(self.tenants[0].id))
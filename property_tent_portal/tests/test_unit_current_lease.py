@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+
+from freezegun import freeze_time
+
+from odoo.tests import tagged
+
+from odoo.addons.property_tent_portal.tests.common import PropertyTestCommon
+
+
+@tagged("post_install", "-at_install")
+class TestUnitCurrentLease(PropertyTestCommon):
+    def test_current_lease(self):
+        units = self._create_units(3)
+        tenants = self._create_tenants(3)
+        current = self._create_leases(units[0], tenants[0], start_date=self.today - timedelta(days=30))
+        self._create_leases(units[1], tenants[1], start_date=self.today + timedelta(days=30))
+        self._create_leases(
+            units[2], tenants[2], start_date=self.today - timedelta(days=60), end_date=self.today - timedelta(days=1)
+        )
+        self.assertEqual(units[0].current_lease_id, current)
+        self.assertEqual(units[0].current_tenant_id, tenants[0])
+        self.assertFalse(units[1].current_lease_id, "A lease that has not started is not current")
+        self.assertFalse(units[2].current_lease_id, "An expired lease is not current")
+
+    def test_newest_lease_is_current(self):
+        unit = self._create_units(1)
+        tenants = self._create_tenants(2)
+        self._create_leases(unit, tenants[0], start_date=self.today - timedelta(days=60))
+        newest = self._create_leases(unit, tenants[1], start_date=self.today - timedelta(days=10))
+        self.assertEqual(unit.current_lease_id, newest)
+
+    def test_portal_tenant_follows_the_newest_active_lease(self):
+        unit = self._create_units(1)
+        tenants = self._create_tenants(2)
+        older = self._create_leases(unit, tenants[0], start_date=self.today - timedelta(days=60))
+        newest = self._create_leases(unit, tenants[1], start_date=self.today - timedelta(days=10))
+        self.assertEqual(unit.tenant_commercial_partner_id, tenants[1])
+        # Overlapping leases: the outgoing tenant keeps their lease only.
+        self.assertEqual(older.tenant_commercial_partner_id, tenants[0])
+        older.start_date = self.today - timedelta(days=5)
+        self.assertEqual(unit.tenant_commercial_partner_id, tenants[0])
+        older.active = False
+        self.assertEqual(unit.tenant_commercial_partner_id, tenants[1])
+        newest.active = False
+        self.assertFalse(unit.tenant_commercial_partner_id)
+
+    def test_compute_query_count_is_constant(self):
+        counts = []
+        for size in (10, 100):
+            units = self._create_units(size)
+            self._create_leases(units, self._create_tenants(size))
+            counts.append(
+                self._count_queries(lambda: self._recompute(units, ["current_lease_id", "current_tenant_id"]))
+            )
+        self.assertEqual(counts[0], counts[1], "The compute must not issue queries per unit")
+
+    def test_sync_occupancy_follows_the_date(self):
+        units = self._create_units(2)
+        tenants = self._create_tenants(2)
+        ending = self._create_leases(
+            units[0], tenants[0], start_date=self.today - timedelta(days=30), end_date=self.today
+        )
+        self._create_leases(units[1], tenants[1], start_date=self.today + timedelta(days=1))
+        self.env["property.unit"]._sync_occupancy(self.today)
+        self.assertEqual(units[0].current_lease_id, ending)
+        self.assertEqual(units.mapped("status"), ["occupied", "vacant"])
+
+        tomorrow = self.today + timedelta(days=1)
+        with freeze_time(tomorrow):
+            self.env["property.unit"]._sync_occupancy(tomorrow)
+        self.assertFalse(units[0].current_lease_id, "The lease ended yesterday")
+        self.assertEqual(units[1].current_tenant_id, tenants[1], "The lease started today")
+        self.assertEqual(units.mapped("status"), ["vacant", "occupied"])